@@ -0,0 +1,128 @@
+"""Benchmark the pitch backends on the same clips.
+
+Runs every backend in vocal_analyzer.pitch on each clip and reports the
+time spent estimating pitch plus the range it reports. Without arguments a
+synthetic vocal line with a known f0 contour is generated, and the
+reported range and per-frame f0 are compared to the truth.
+
+    uv run python benchmarks/pitch_backends.py [clip.wav ...] [--profile fast] [--json out.json]
+"""
+import argparse
+import json
+import time
+
+import librosa
+import numpy as np
+
+from vocal_analyzer.config import QUALITY_PROFILES
+from vocal_analyzer.pitch import PITCH_BACKENDS
+from vocal_analyzer.range_analyzer import frequency_to_note
+from vocal_analyzer.spectral import SpectralContext
+
+
+def synthetic_vocal(sr, seconds=20.0, seed=0):
+    """A sung-like line: gliding f0 (C3-C6) with vibrato, harmonics, rests and noise.
+
+    Returns:
+        tuple: (samples, per-sample f0 in Hz, 0 during rests)
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    # Slow melodic contour between C3 (130.8 Hz) and C6 (1046.5 Hz) on a log scale
+    contour = 0.5 + 0.5 * np.sin(2 * np.pi * t / seconds * 3) * np.sin(2 * np.pi * t / 7.3)
+    f0 = 130.8 * 2 ** (3 * contour) * 2 ** (0.02 * np.sin(2 * np.pi * 5.5 * t))
+    voiced = (np.sin(2 * np.pi * t / 2.1) > -0.8).astype(np.float64)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(0.4 / k * np.sin(k * phase) for k in range(1, 6)) * voiced
+    y = y + 0.003 * rng.standard_normal(len(t))
+    return y.astype(np.float32), f0 * voiced
+
+
+def frame_truth(f0, n_frames, hop_length):
+    """Reference f0 at each frame center (0 where unvoiced)."""
+    centers = np.minimum(np.arange(n_frames) * hop_length, len(f0) - 1)
+    return f0[centers]
+
+
+def run_backend(y, sr, profile, backend, truth=None):
+    """Time one backend on one clip and summarize what it reports."""
+    settings = {key: profile[key] for key in ("n_fft", "hop_length", "bins_per_octave")}
+    context = SpectralContext(y, sr, pitch_backend=backend, **settings)
+    start = time.perf_counter()
+    stats = context.pitch_statistics
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "backend": backend,
+        "seconds": round(elapsed, 4),
+        "voiced_frames": stats.count,
+        "min_note": frequency_to_note(stats.minimum) if stats.count else "N/A",
+        "max_note": frequency_to_note(stats.maximum) if stats.count else "N/A",
+        "mean_pitch": round(stats.mean, 2),
+    }
+    if truth is not None:
+        voiced_truth = truth[truth > 0]
+        if stats.count:
+            result["min_error_cents"] = round(1200 * np.log2(stats.minimum / voiced_truth.min()), 1)
+            result["max_error_cents"] = round(1200 * np.log2(stats.maximum / voiced_truth.max()), 1)
+        if backend != "piptrack":
+            f0 = context.pitch_track.f0
+            ref = frame_truth(truth, len(f0), profile["hop_length"])
+            both = (f0 > 0) & (ref > 0)
+            if both.any():
+                cents = np.abs(1200 * np.log2(f0[both] / ref[both]))
+                result["median_frame_error_cents"] = round(float(np.median(cents)), 1)
+                result["frames_within_50_cents"] = round(float(np.mean(cents < 50)), 3)
+            result["voicing_recall"] = round(float(np.mean(f0[ref > 0] > 0)), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pitch backends")
+    parser.add_argument("clips", nargs="*", help="Audio clips (default: a synthetic vocal line)")
+    parser.add_argument("--profile", default="balanced", choices=sorted(QUALITY_PROFILES))
+    parser.add_argument("--backends", nargs="+", default=list(PITCH_BACKENDS), choices=PITCH_BACKENDS)
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    profile = QUALITY_PROFILES[args.profile]
+    sr = profile["sample_rate"]
+    clips = []
+    if args.clips:
+        for path in args.clips:
+            y, _ = librosa.load(path, sr=sr, res_type=profile["res_type"])
+            clips.append((path, y, None))
+    else:
+        y, truth = synthetic_vocal(sr)
+        clips.append(("synthetic vocal", y, truth))
+
+    # Warm up lazily loaded librosa/numba code so the first backend isn't penalized
+    warm = np.zeros(sr, dtype=np.float32)
+    for backend in args.backends:
+        run_backend(warm, sr, profile, backend)
+
+    results = []
+    for name, y, truth in clips:
+        print(f"\n{name} ({len(y) / sr:.1f} s, profile {args.profile})")
+        for backend in args.backends:
+            result = run_backend(y, sr, profile, backend, truth)
+            result["clip"] = name
+            results.append(result)
+            extra = "".join(
+                f"  {key}={result[key]}"
+                for key in ("min_error_cents", "max_error_cents", "median_frame_error_cents",
+                            "frames_within_50_cents", "voicing_recall")
+                if key in result
+            )
+            print(
+                f"  {backend:9s} {result['seconds']:8.3f} s  {result['voiced_frames']:7d} frames  "
+                f"{result['min_note']:>4s}-{result['max_note']:<4s}{extra}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
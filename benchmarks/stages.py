@@ -0,0 +1,336 @@
+"""Benchmark the analysis stages on deterministic synthetic audio.
+
+Generates fixtures with known answers (a pitch sweep over a known range, a
+sung-like vocal line, chord progressions in known keys at a known tempo,
+noise beds), then times and memory-profiles extract_features,
+RangeAnalyzer.analyze, find_key, generate_output and the whole pipeline,
+and checks the answers (detected key, tempo, range).
+
+Every stage gets its own SpectralContext, so a stage's time includes the
+STFT/chroma work it triggers. The pipeline run has separation,
+transcription and LLM analysis disabled, so neither the separator nor the
+OpenAI API is involved. Fixtures are generated from fixed seeds, so results
+are comparable across commits:
+
+    uv run python benchmarks/stages.py --json base.json
+    git checkout my-branch
+    uv run python benchmarks/stages.py --compare base.json
+
+--compare exits non-zero when a stage got slower than --tolerance times the
+baseline (by more than --min-delta seconds) or an accuracy check that
+passed in the baseline now fails.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from pitch_backends import synthetic_vocal
+
+from vocal_analyzer.config import QUALITY_PROFILES, Config
+from vocal_analyzer.feature_extractor import extract_features
+from vocal_analyzer.key_finder import PITCHES, find_key
+from vocal_analyzer.main import AnalysisSession, analyze_file
+from vocal_analyzer.output_generator import generate_output
+from vocal_analyzer.range_analyzer import RangeAnalyzer, frequency_to_note
+from vocal_analyzer.spectral import SpectralContext, spectral_settings
+
+MAJOR_STEPS = [0, 2, 4, 5, 7, 9, 11]
+MINOR_STEPS = [0, 2, 3, 5, 7, 8, 10]
+
+
+def tone(freqs, seconds, sr, harmonics=4, decay=3.0):
+    """Plucked-string-like notes: harmonics with an exponential decay."""
+    t = np.arange(int(seconds * sr)) / sr
+    envelope = np.exp(-decay * t / seconds)
+    y = np.zeros_like(t)
+    for f in freqs:
+        for k in range(1, harmonics + 1):
+            if k * f < sr / 2:
+                y += np.sin(2 * np.pi * k * f * t) / k
+    return y * envelope / max(len(freqs), 1)
+
+
+def sweep(sr, seconds, fmin=130.81, fmax=523.25):
+    """Logarithmic sweep up and back down between two pitches, with harmonics.
+
+    Returns:
+        tuple: (samples, truth) where truth holds min_pitch/max_pitch
+    """
+    t = np.arange(int(seconds * sr)) / sr
+    # Up in the first half, down in the second, 0.5 s rests at both ends
+    position = 1 - np.abs(2 * t / seconds - 1)
+    f0 = fmin * (fmax / fmin) ** position
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(0.5 / k * np.sin(k * phase) for k in range(1, 5))
+    rests = (t < 0.5) | (t > seconds - 0.5)
+    y[rests] = 0
+    return y.astype(np.float32), {"min_pitch": f0[~rests].min(), "max_pitch": fmax}
+
+
+def chord_progression(sr, seconds, key, bpm=120.0):
+    """I-IV-V-I (i-iv-V-i in minor) progression in a key, with bass and clicks.
+
+    Chords change every bar of 4 beats; a short noise click marks every beat.
+
+    Returns:
+        tuple: (samples, truth) where truth holds key and tempo
+    """
+    tonic_name, mode = key.split()
+    tonic = PITCHES.index(tonic_name)
+    steps = MAJOR_STEPS if mode == "major" else MINOR_STEPS
+    beat = 60.0 / bpm
+    bar = 4 * beat
+    rng = np.random.default_rng(PITCHES.index(tonic_name) + (12 if mode == "minor" else 0))
+
+    def degree(d):
+        """Semitone offset of a scale degree (0-based), raised leading tone in minor V."""
+        return steps[d % 7] + 12 * (d // 7)
+
+    chords = [(0, 2, 4), (3, 5, 7), (4, 6, 8), (0, 2, 4)]
+    n = int(seconds * sr)
+    y = np.zeros(n)
+    for index in range(int(np.ceil(seconds / bar))):
+        root = chords[index % len(chords)]
+        semitones = [degree(d) for d in root]
+        if mode == "minor" and root[0] == 4:
+            semitones[1] += 1  # major V in minor keys
+        base = 220.0 * 2 ** ((tonic - 9) / 12)  # tonic in the octave of A3
+        freqs = [base * 2 ** (s / 12) for s in semitones]
+        notes = tone(freqs, bar, sr) + 0.3 * tone([freqs[0] / 2], bar, sr, decay=1.5)
+        start = int(index * bar * sr)
+        y[start : start + len(notes)] += notes[: n - start]
+
+    click = rng.standard_normal(int(0.01 * sr)) * np.hanning(int(0.01 * sr))
+    for start in (np.arange(0, seconds, beat) * sr).astype(int):
+        y[start : start + len(click)] += 0.6 * click[: n - start]
+    y = 0.8 * y / np.max(np.abs(y))
+    return y.astype(np.float32), {"key": key, "tempo": bpm}
+
+
+def noise_bed(y, snr_db, seed=0):
+    """Add white noise at a signal-to-noise ratio (dB)."""
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal(len(y))
+    scale = np.sqrt(np.mean(y**2) / np.mean(noise**2) / 10 ** (snr_db / 10))
+    return (y + scale * noise).astype(np.float32)
+
+
+def fixtures(sr, durations):
+    """All benchmark fixtures as (name, samples, truth)."""
+    result = []
+    for seconds in durations:
+        y, truth = sweep(sr, seconds)
+        result.append((f"sweep-{seconds:g}s", y, truth))
+
+        y, f0 = synthetic_vocal(sr, seconds)
+        voiced = f0[f0 > 0]
+        result.append((f"vocal-{seconds:g}s", y, {"min_pitch": voiced.min(), "max_pitch": voiced.max()}))
+
+        for index, key in enumerate(("D major", "F# minor")):
+            y, truth = chord_progression(sr, seconds, key, bpm=120.0 if index == 0 else 96.0)
+            result.append((f"chords-{key.replace(' ', '-')}-{seconds:g}s", y, truth))
+            result.append(
+                (f"chords-{key.replace(' ', '-')}-noisy-{seconds:g}s", noise_bed(y, 10, seed=index), truth)
+            )
+    return result
+
+
+def measure(func, repeat):
+    """Median seconds of repeat runs of func, its peak traced memory (MB) and result.
+
+    Memory is traced in one extra run, so tracing overhead doesn't skew the times.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak / 2**20, result
+
+
+def cents(a, b):
+    return float(1200 * np.log2(a / b)) if a > 0 and b > 0 else None
+
+
+def checks_for(stage, result, truth):
+    """Accuracy checks of a stage result against a fixture's known answers."""
+    checks = {}
+    if stage == "find_key" and "key" in truth:
+        checks["key"] = {"expected": truth["key"], "got": result["key"], "ok": result["key"] == truth["key"]}
+    if stage == "extract_features" and "tempo" in truth:
+        tempo = result["tempo"]
+        # Beat trackers commonly report half or double tempo
+        error = min(abs(tempo * m - truth["tempo"]) / truth["tempo"] for m in (0.5, 1, 2))
+        checks["tempo"] = {"expected": truth["tempo"], "got": round(tempo, 2), "ok": error < 0.04}
+    if stage == "range_analysis" and "min_pitch" in truth:
+        for bound in ("min_pitch", "max_pitch"):
+            error = cents(result[bound], truth[bound])
+            checks[bound] = {
+                "expected": frequency_to_note(truth[bound]),
+                "got": result.get(bound.replace("pitch", "note")),
+                "error_cents": None if error is None else round(error, 1),
+                "ok": error is not None and abs(error) <= 100,
+            }
+    return checks
+
+
+def run_suite(args):
+    profile = dict(QUALITY_PROFILES[args.profile], pitch_backend=args.pitch_backend)
+    sr = profile["sample_rate"]
+    settings = spectral_settings(profile)
+    config = Config(config_path=os.devnull)
+    for feature in ("vocal_extraction", "transcription", "llm_analysis"):
+        config.features[feature] = False
+    config.analysis["profile"] = args.profile
+    config.analysis["pitch_backend"] = args.pitch_backend
+    # Every repeat must do the work: no result/PCM cache, no incremental re-runs
+    config.cache["enabled"] = False
+    config.cache["pcm_max_size_mb"] = 0
+    config.cache["incremental"] = False
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Compile librosa's numba code before anything is timed
+        warm = chord_progression(sr, 5, "C major")[0]
+        extract_features("warm-up", spectral=SpectralContext(warm, sr, **settings))
+        find_key("warm-up", spectral=SpectralContext(warm, sr, **settings))
+
+        for name, y, truth in fixtures(sr, args.durations):
+            audio_file = os.path.join(tmp, f"{name}.wav")
+            sf.write(audio_file, y, sr)
+            output_dir = os.path.join(tmp, f"{name}-analysis")
+            os.makedirs(output_dir)
+            range_results = RangeAnalyzer(audio_file, output_dir, spectral=SpectralContext(y, sr, **settings)).analyze()
+            key_info = find_key(audio_file, spectral=SpectralContext(y, sr, **settings))
+
+            stages = {
+                "extract_features": lambda: extract_features(audio_file, spectral=SpectralContext(y, sr, **settings)),
+                "range_analysis": lambda: RangeAnalyzer(
+                    audio_file, output_dir, spectral=SpectralContext(y, sr, **settings)
+                ).analyze(),
+                "find_key": lambda: find_key(audio_file, spectral=SpectralContext(y, sr, **settings)),
+                "generate_output": lambda: generate_output(
+                    output_dir, range_results, "LLM analysis placeholder", audio_file, key_info, "la la la"
+                ),
+                "pipeline": lambda: analyze_file(
+                    audio_file, output_dir, config, AnalysisSession(profile=profile), None, False, True
+                ),
+            }
+            print(f"\n{name} ({len(y) / sr:g} s)")
+            for stage in args.stages:
+                seconds, peak_mb, result = measure(stages[stage], args.repeat)
+                checks = checks_for(stage, result, truth)
+                results.append({
+                    "fixture": name,
+                    "duration": round(len(y) / sr, 2),
+                    "stage": stage,
+                    "seconds": round(seconds, 4),
+                    "peak_mb": round(peak_mb, 2),
+                    "checks": checks,
+                })
+                summary = "  ".join(
+                    f"{check}={'ok' if value['ok'] else 'FAIL'}({value['got']})"
+                    for check, value in checks.items()
+                )
+                print(f"  {stage:17s} {seconds:8.3f} s  {peak_mb:8.1f} MB  {summary}")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results, tolerance, min_delta=0.01):
+    """Print per-stage changes against a baseline run; return the regressions."""
+    before = {(r["fixture"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} (tolerance {tolerance:g}x):")
+    for result in results:
+        old = before.get((result["fixture"], result["stage"]))
+        if old is None:
+            continue
+        ratio = result["seconds"] / old["seconds"] if old["seconds"] else 1.0
+        notes = []
+        # Ignore jitter of stages that only take milliseconds
+        if ratio > tolerance and result["seconds"] - old["seconds"] > min_delta:
+            notes.append("SLOWER")
+        for check, value in result["checks"].items():
+            if old["checks"].get(check, {}).get("ok") and not value["ok"]:
+                notes.append(f"{check} regressed")
+        if notes:
+            regressions.append((result["fixture"], result["stage"], notes))
+        print(
+            f"  {result['fixture']:32s} {result['stage']:17s} {old['seconds']:8.3f} -> "
+            f"{result['seconds']:8.3f} s ({ratio:5.2f}x)  {' '.join(notes)}"
+        )
+    return regressions
+
+
+def main():
+    stage_names = ["extract_features", "range_analysis", "find_key", "generate_output", "pipeline"]
+    parser = argparse.ArgumentParser(description="Benchmark the analysis stages on synthetic audio")
+    parser.add_argument("--durations", nargs="+", type=float, default=[10.0, 60.0], help="Fixture lengths in seconds")
+    parser.add_argument("--profile", default="balanced", choices=sorted(QUALITY_PROFILES))
+    parser.add_argument("--pitch-backend", default="piptrack")
+    parser.add_argument("--stages", nargs="+", default=stage_names, choices=stage_names)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the median time counts")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file from an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Allowed slowdown factor in --compare")
+    parser.add_argument(
+        "--min-delta", type=float, default=0.01, help="Slowdowns below this many seconds are ignored"
+    )
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "profile": args.profile,
+        "pitch_backend": args.pitch_backend,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = [(r["fixture"], r["stage"], c) for r in results for c, v in r["checks"].items() if not v["ok"]]
+    if failed:
+        print(f"\n{len(failed)} accuracy checks failed")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
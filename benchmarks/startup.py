@@ -0,0 +1,100 @@
+"""Check that the va CLI starts quickly.
+
+Times `va --help` in fresh interpreters and fails (exit status 1) when the
+best run is slower than the budget. With -X importtime the slowest imports
+of `vocal_analyzer.main` are listed too, and any heavy dependency
+(librosa, matplotlib, openai, ...) imported at startup also fails the check.
+
+    uv run python benchmarks/startup.py [--budget 0.5] [--runs 5] [--top 10]
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+# Imported only by the stages that need them, never by `va --help`
+HEAVY_MODULES = (
+    "audio_separator",
+    "librosa",
+    "matplotlib",
+    "numba",
+    "numpy",
+    "openai",
+    "pydub",
+    "scipy",
+    "soundfile",
+)
+
+
+def time_help(runs):
+    """Wall-clock seconds of each `va --help` run in a new interpreter."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "vocal_analyzer.main", "--help"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _importtime(code):
+    """(cumulative microseconds, module) of every import made while running code."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        entries.append((int(cumulative), module.strip()))
+    return entries
+
+
+def import_times():
+    """Imports made by vocal_analyzer.main, excluding interpreter startup (site etc.)."""
+    startup = {module for _, module in _importtime("pass")}
+    return [entry for entry in _importtime("import vocal_analyzer.main") if entry[1] not in startup]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the startup time of the va CLI")
+    parser.add_argument(
+        "--budget", type=float, default=0.5, help="Maximum seconds for `va --help` (default: 0.5)"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs; the best one counts")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    entries = import_times()
+    print("Slowest imports of vocal_analyzer.main (cumulative):")
+    for cumulative, module in sorted(entries, reverse=True)[: args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    heavy = sorted(
+        {module for _, module in entries if module.split(".")[0] in HEAVY_MODULES}
+    )
+    times = time_help(args.runs)
+    best = min(times)
+    print(f"va --help: best {best:.3f} s of {args.runs} runs (budget {args.budget:.3f} s)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if best > args.budget:
+        print(f"FAIL: va --help is over budget by {best - args.budget:.3f} s")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
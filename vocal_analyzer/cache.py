@@ -0,0 +1,388 @@
+"""Content-addressed cache of stage results.
+
+Entries are keyed by a hash of the input audio *content* (not its path),
+the model and the config settings that affect the stage, so a result is
+reused wherever the same audio is analyzed with the same settings and is
+never reused after either changes.
+
+Layout: <root>/<stage>/<key[:2]>/<key>/result.json plus copies of any
+stored files (stems, plots). Entries are staged in a temporary directory
+and renamed into place, so a partially written entry is never read. The
+least recently used entries are evicted once the cache outgrows its size
+limit.
+
+PCMCache applies the same content addressing to decoded audio, so stages
+re-reading a stem or mix can memory-map it instead of decoding it again.
+
+ModelListCache keeps the separator's model metadata on disk for a limited
+time, so listing models or resolving a model's stems does not rebuild it.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Bump to invalidate every cached result after a change in stage output
+CACHE_VERSION = 4
+
+# Bump to invalidate the cached model list after a change in its format
+MODEL_LIST_VERSION = 1
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's content.
+
+    Digests are memoized per (path, size, mtime), so a file is hashed once
+    per process unless it changes.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if memo_key in _digests:
+            return _digests[memo_key]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _digests_lock:
+        _digests[memo_key] = digest
+    return digest
+
+
+def json_default(value):
+    """json.dumps default hook for NumPy values in analysis results."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _same_file_contents(src, dst):
+    """Cheap check whether dst is already an unmodified copy of src."""
+    if not os.path.exists(dst):
+        return False
+    a, b = os.stat(src), os.stat(dst)
+    return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+
+class ResultCache:
+    """Content-addressed store for stage results and the files they produce.
+
+    Entries are touched on every hit; once the cache grows beyond max_bytes
+    the least recently used ones are evicted, like PCMCache.
+
+    Arguments:
+        root: cache directory
+        max_bytes: total size limit of the cached entries (None for no limit)
+    """
+
+    def __init__(self, root, max_bytes=None):
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key(self, stage, audio_digest, **settings):
+        """Build the cache key for a stage.
+
+        Args:
+            stage: stage name
+            audio_digest: file_digest of the audio the stage reads
+            **settings: model name, config sections, or any other values the
+                stage output depends on (must be JSON serializable)
+
+        Returns:
+            str: hex digest identifying the entry
+        """
+        payload = json.dumps(
+            {"version": CACHE_VERSION, "stage": stage, "audio": audio_digest, "settings": settings},
+            sort_keys=True,
+            default=json_default,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, stage, key):
+        return os.path.join(self.root, stage, key[:2], key)
+
+    def get(self, stage, key, restore_to=None):
+        """Look up a cached result.
+
+        Args:
+            stage: stage name
+            key: key from key()
+            restore_to: directory to copy the entry's stored files into
+
+        Returns:
+            tuple or None: (value, files) where files maps names to restored
+            paths (or to paths inside the cache if restore_to is None);
+            None on a miss
+        """
+        entry = self._entry_dir(stage, key)
+        result_file = os.path.join(entry, "result.json")
+        try:
+            with open(result_file) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        files = {}
+        for name, filename in record["files"].items():
+            path = os.path.join(entry, filename)
+            if not os.path.exists(path):
+                return None
+            if restore_to is not None:
+                os.makedirs(restore_to, exist_ok=True)
+                restored = os.path.join(restore_to, filename)
+                if not _same_file_contents(path, restored):
+                    shutil.copy2(path, restored)
+                path = restored
+            files[name] = path
+        try:
+            os.utime(result_file)  # mark as recently used
+        except OSError:
+            pass
+        return record["value"], files
+
+    def put(self, stage, key, value, files=None):
+        """Store a result.
+
+        Args:
+            stage: stage name
+            key: key from key()
+            value: JSON-serializable result
+            files: optional dict mapping names to files to store with the result
+        """
+        entry = self._entry_dir(stage, key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(entry))
+        try:
+            stored = {}
+            for name, path in (files or {}).items():
+                filename = os.path.basename(path)
+                shutil.copy2(path, os.path.join(staging, filename))
+                stored[name] = filename
+            with open(os.path.join(staging, "result.json"), "w") as f:
+                json.dump({"value": value, "files": stored}, f, default=json_default)
+
+            if os.path.exists(entry):
+                shutil.rmtree(entry)
+            os.replace(staging, entry)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if self.max_bytes is not None:
+            self.evict()
+
+    def _entries(self):
+        """(last use, size, entry dir) of every complete entry."""
+        entries = []
+        for stage in os.listdir(self.root):
+            stage_dir = os.path.join(self.root, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for prefix in os.listdir(stage_dir):
+                prefix_dir = os.path.join(stage_dir, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue
+                for key in os.listdir(prefix_dir):
+                    if key.startswith(".tmp-"):
+                        continue
+                    entry = os.path.join(prefix_dir, key)
+                    try:
+                        last_used = os.stat(os.path.join(entry, "result.json")).st_mtime
+                        size = sum(
+                            os.stat(os.path.join(entry, name)).st_size for name in os.listdir(entry)
+                        )
+                    except OSError:
+                        continue
+                    entries.append((last_used, size, entry))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+
+class PCMCache:
+    """Size-bounded on-disk cache of decoded, resampled mono PCM.
+
+    Each entry is a float32 .npy file named after the source audio's content
+    hash, the sample rate and the resampler. Hits are opened with np.load(mmap_mode="r"),
+    so a warm re-run maps the samples instead of decoding and resampling
+    again. Entries are touched on every hit and the least recently used ones
+    are evicted once the cache grows beyond max_bytes.
+
+    Arguments:
+        root: cache directory
+        max_bytes: total size limit of the cached PCM files
+    """
+
+    def __init__(self, root, max_bytes=2 << 30):
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, audio_file, sr, res_type):
+        return os.path.join(self.root, f"{file_digest(audio_file)}-{sr}-{res_type}.npy")
+
+    def load(self, audio_file, sr, res_type="soxr_hq"):
+        """Decode audio_file at sr, or map the cached decode.
+
+        Returns:
+            tuple: (samples, sample_rate) like librosa.load; cached samples
+            are a read-only memory map
+        """
+        path = self._path(audio_file, sr, res_type)
+        try:
+            y = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            y = None
+        if y is not None:
+            try:
+                os.utime(path)  # mark as recently used
+            except OSError:
+                pass
+            return y, sr
+
+        import librosa
+
+        y, sr = librosa.load(audio_file, sr=sr, res_type=res_type)
+        self._store(path, y)
+        return y, sr
+
+    def _store(self, path, y):
+        """Write an entry atomically, then evict old entries over the limit."""
+        if y.nbytes > self.max_bytes:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        fd, staging = tempfile.mkstemp(prefix=".tmp-", suffix=".npy", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(y, dtype=np.float32))
+            os.replace(staging, path)
+        except Exception:
+            if os.path.exists(staging):
+                os.unlink(staging)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if name.endswith(".npy") and not name.startswith(".tmp-"):
+                    try:
+                        stat = os.stat(os.path.join(self.root, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(os.path.join(self.root, name))
+                except OSError:
+                    continue
+                total -= size
+
+
+class ModelListCache:
+    """Time-limited on-disk cache of the separator model list.
+
+    The list is kept in memory for the life of the process and in a JSON
+    file shared between processes; it is fetched again once the file is
+    older than ttl seconds or when a refresh is requested.
+
+    Arguments:
+        path: JSON file holding the cached model list
+        ttl: seconds before the cached list is fetched again (0 never reuses it)
+    """
+
+    def __init__(self, path, ttl=24 * 3600):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self._models = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fresh(self, fetched_at):
+        return time.time() - fetched_at < self.ttl
+
+    def _read(self):
+        """(models, fetched_at) from the cache file, or None if unusable."""
+        try:
+            with open(self.path) as f:
+                record = json.load(f)
+            if record["version"] != MODEL_LIST_VERSION:
+                return None
+            return record["models"], record["fetched_at"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write(self, models, fetched_at):
+        """Write the cache file atomically."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, staging = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {"version": MODEL_LIST_VERSION, "fetched_at": fetched_at, "models": models},
+                    f,
+                    default=json_default,
+                )
+            os.replace(staging, self.path)
+        except Exception:
+            if os.path.exists(staging):
+                os.unlink(staging)
+            raise
+
+    def get(self, fetch, refresh=False):
+        """Return the model list, calling fetch() only when the cache is stale.
+
+        Args:
+            fetch: callable returning the model list (a JSON-serializable dict)
+            refresh: fetch the list even if the cached one is still fresh
+
+        Returns:
+            dict: the model list
+        """
+        with self._lock:
+            if not refresh:
+                if self._models is not None and self._fresh(self._fetched_at):
+                    return self._models
+                cached = self._read()
+                if cached is not None and self._fresh(cached[1]):
+                    self._models, self._fetched_at = cached
+                    return self._models
+
+            models = fetch()
+            self._fetched_at = time.time()
+            # Round-trip through JSON so fresh and cached lists look the same
+            self._models = json.loads(json.dumps(models, default=json_default))
+            try:
+                self._write(self._models, self._fetched_at)
+            except OSError as e:
+                print(f"Warning: could not write model list cache {self.path}: {e}")
+            return self._models
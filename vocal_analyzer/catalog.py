@@ -0,0 +1,289 @@
+"""SQLite catalog of completed analyses, and the `va query` subcommand.
+
+Every successful run records one row per input file: its content hash,
+path, settings, detected key, vocal range, tempo and where the report, stems
+and plot were written. Re-analyzing a file replaces its row. Indexed
+columns (key, range, tempo) make library questions like "all tracks in
+A minor with a max note above C5" a single query instead of a walk over
+the analysis directories:
+
+    va query --key "A minor" --max-note-above C5
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+FLATS = {"Db": "C#", "Eb": "D#", "Gb": "F#", "Ab": "G#", "Bb": "A#"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    input_file TEXT PRIMARY KEY,
+    input_digest TEXT NOT NULL,
+    analyzed_at TEXT NOT NULL,
+    model TEXT,
+    profile TEXT,
+    key TEXT,
+    key_correlation REAL,
+    alt_key TEXT,
+    key_source TEXT,
+    min_note TEXT,
+    max_note TEXT,
+    min_pitch REAL,
+    max_pitch REAL,
+    min_midi INTEGER,
+    max_midi INTEGER,
+    tempo REAL,
+    output_dir TEXT,
+    analysis_file TEXT,
+    vocal_file TEXT,
+    plot_file TEXT,
+    artifacts TEXT
+);
+CREATE INDEX IF NOT EXISTS analyses_digest ON analyses (input_digest);
+CREATE INDEX IF NOT EXISTS analyses_key ON analyses (key);
+CREATE INDEX IF NOT EXISTS analyses_max_midi ON analyses (max_midi);
+CREATE INDEX IF NOT EXISTS analyses_min_midi ON analyses (min_midi);
+CREATE INDEX IF NOT EXISTS analyses_tempo ON analyses (tempo);
+"""
+
+# Columns shown by `va query` unless --columns is given
+DEFAULT_COLUMNS = ["input_file", "key", "min_note", "max_note", "tempo", "analysis_file"]
+
+
+def frequency_to_midi(frequency):
+    """MIDI note number of a frequency, rounded like range_analyzer.frequency_to_note."""
+    if not frequency or frequency <= 0:
+        return None
+    return int(round(69 + 12 * math.log2(frequency / 440.0)))
+
+
+def note_to_midi(note):
+    """MIDI note number of a note name like 'C5', 'F#3' or 'Bb2'.
+
+    Raises:
+        ValueError: if the name is not a note
+    """
+    match = re.fullmatch(r"([A-Ga-g][#b]?)(-?\d+)", note.strip())
+    if not match:
+        raise ValueError(f"Not a note name: {note!r} (expected e.g. C5, F#3, Bb2)")
+    name = match.group(1)[0].upper() + match.group(1)[1:]
+    name = FLATS.get(name, name)
+    if name not in NOTE_NAMES:
+        # E# / B# / Cb / Fb
+        raise ValueError(f"Not a note name: {note!r}")
+    return 12 * (int(match.group(2)) + 1) + NOTE_NAMES.index(name)
+
+
+class Catalog:
+    """Catalog of analyses in an SQLite database.
+
+    Every call opens its own connection, so a catalog can be shared by the
+    threads of a batch or server and by concurrent `va` processes.
+
+    Arguments:
+        path: database file (created on first use)
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+
+    def _connect(self, readonly=False):
+        if readonly:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"No catalog at {self.path} (run an analysis first)")
+            return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def add(self, result, input_digest, model=None, profile=None):
+        """Record (or replace) the analysis of one file.
+
+        Args:
+            result: dict returned by analyze_file
+            input_digest: content hash of the input file (cache.file_digest)
+            model: separation model used (None if extraction was disabled)
+            profile: quality profile name
+        """
+        key_info = result.get("key_info") or {}
+        range_results = result.get("range_results") or {}
+        features = result.get("features") or {}
+        min_pitch = range_results.get("min_pitch", features.get("min_pitch"))
+        max_pitch = range_results.get("max_pitch", features.get("max_pitch"))
+        row = {
+            "input_file": os.path.abspath(result["input_file"]),
+            "input_digest": input_digest,
+            "analyzed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "model": model,
+            "profile": profile,
+            "key": key_info.get("key"),
+            "key_correlation": key_info.get("correlation"),
+            "alt_key": key_info.get("alt_key"),
+            "key_source": key_info.get("source"),
+            "min_note": range_results.get("min_note", features.get("min_note")),
+            "max_note": range_results.get("max_note", features.get("max_note")),
+            "min_pitch": float(min_pitch) if min_pitch else None,
+            "max_pitch": float(max_pitch) if max_pitch else None,
+            "min_midi": frequency_to_midi(min_pitch),
+            "max_midi": frequency_to_midi(max_pitch),
+            "tempo": float(features["tempo"]) if features.get("tempo") is not None else None,
+            "output_dir": os.path.abspath(result["output_dir"]),
+            "analysis_file": os.path.abspath(result["analysis_file"]),
+            "vocal_file": os.path.abspath(result["vocal_file"]) if result.get("vocal_file") else None,
+            "plot_file": os.path.abspath(result["plot_file"]) if result.get("plot_file") else None,
+            "artifacts": json.dumps(
+                [os.path.abspath(path) for path in result.get("output_files", []) + result.get("data_files", [])]
+            ),
+        }
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{column}" for column in row)
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    f"INSERT OR REPLACE INTO analyses ({columns}) VALUES ({placeholders})", row
+                )
+        finally:
+            connection.close()
+
+    def query(self, where=(), params=(), order_by="input_file", limit=None):
+        """Select catalog rows.
+
+        Args:
+            where: SQL conditions, combined with AND
+            params: parameters of the ? placeholders in where
+            order_by: SQL ORDER BY expression
+            limit: maximum number of rows (None for all)
+
+        Returns:
+            list: one dict per row
+        """
+        sql = "SELECT * FROM analyses"
+        if where:
+            sql += " WHERE " + " AND ".join(f"({condition})" for condition in where)
+        sql += f" ORDER BY {order_by}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        connection = self._connect(readonly=True)
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(sql, list(params))]
+        finally:
+            connection.close()
+
+
+def query_main(argv=None):
+    """Entry point for `va query`."""
+    from .config import Config
+
+    parser = argparse.ArgumentParser(
+        prog="va query",
+        description="Search the catalog of completed analyses",
+        epilog='Example: va query --key "A minor" --max-note-above C5',
+    )
+    parser.add_argument("--config", default=None, help="Path to config file")
+    parser.add_argument("--catalog", default=None, help="Catalog database (overrides config)")
+    parser.add_argument("--key", help='Detected key, e.g. "A minor"')
+    parser.add_argument("--max-note-above", metavar="NOTE", help="Highest note above NOTE (e.g. C5)")
+    parser.add_argument("--max-note-below", metavar="NOTE", help="Highest note below NOTE")
+    parser.add_argument("--min-note-above", metavar="NOTE", help="Lowest note above NOTE")
+    parser.add_argument("--min-note-below", metavar="NOTE", help="Lowest note below NOTE (e.g. G2)")
+    parser.add_argument("--tempo-min", type=float, help="Minimum tempo (BPM)")
+    parser.add_argument("--tempo-max", type=float, help="Maximum tempo (BPM)")
+    parser.add_argument("--path", help="Input path glob, e.g. '*/album/*'")
+    parser.add_argument("--model", help="Separation model")
+    parser.add_argument("--where", action="append", default=[], help="Extra SQL condition (repeatable)")
+    parser.add_argument("--sort", default="input_file", help="Column to sort by (prefix - for descending)")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of results")
+    parser.add_argument("--columns", help="Comma-separated columns to show")
+    parser.add_argument(
+        "--format", choices=["table", "json", "csv", "paths"], default="table", help="Output format"
+    )
+    args = parser.parse_args(argv)
+
+    config = Config(config_path=args.config)
+    catalog = Catalog(args.catalog or config.catalog["path"])
+
+    where = list(args.where)
+    params = []
+    try:
+        for option, condition in (
+            ("max_note_above", "max_midi > ?"),
+            ("max_note_below", "max_midi < ?"),
+            ("min_note_above", "min_midi > ?"),
+            ("min_note_below", "min_midi < ?"),
+        ):
+            note = getattr(args, option)
+            if note is not None:
+                where.append(condition)
+                params.append(note_to_midi(note))
+    except ValueError as e:
+        parser.error(str(e))
+    for value, condition in (
+        (args.key, "key = ?"),
+        (args.tempo_min, "tempo >= ?"),
+        (args.tempo_max, "tempo <= ?"),
+        (args.path, "input_file GLOB ?"),
+        (args.model, "model = ?"),
+    ):
+        if value is not None:
+            where.append(condition)
+            params.append(value)
+
+    sort = args.sort.lstrip("-")
+    if not re.fullmatch(r"\w+", sort):
+        parser.error(f"Invalid sort column: {args.sort}")
+    order_by = f"{sort} DESC" if args.sort.startswith("-") else sort
+
+    try:
+        rows = catalog.query(where, params, order_by=order_by, limit=args.limit)
+    except (FileNotFoundError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        return 1
+
+    columns = args.columns.split(",") if args.columns else DEFAULT_COLUMNS
+    if args.format == "json":
+        for row in rows:
+            print(json.dumps(row))
+    elif args.format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    elif args.format == "paths":
+        for row in rows:
+            print(row["input_file"])
+    else:
+        _print_table(rows, columns)
+        print(f"{len(rows)} analyses")
+    return 0
+
+
+def _print_table(rows, columns):
+    """Print rows as aligned text columns."""
+    cells = [[_format_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [
+        max([len(column)] + [len(line[i]) for line in cells]) for i, column in enumerate(columns)
+    ]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def _format_cell(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    return str(value)
@@ -9,6 +9,33 @@ if sys.version_info >= (3, 11):
 else:
     import tomli as tomllib
 
+# Analysis quality profiles: sample rate and resampler used to decode audio,
+# FFT/hop sizes of the spectral analysis, and CQT resolution of the chroma
+# used for key detection. "balanced" matches the original librosa defaults.
+QUALITY_PROFILES = {
+    "fast": {
+        "sample_rate": 11025,
+        "res_type": "soxr_lq",
+        "n_fft": 1024,
+        "hop_length": 512,
+        "bins_per_octave": 12,
+    },
+    "balanced": {
+        "sample_rate": 22050,
+        "res_type": "soxr_hq",
+        "n_fft": 2048,
+        "hop_length": 512,
+        "bins_per_octave": 24,
+    },
+    "accurate": {
+        "sample_rate": 44100,
+        "res_type": "soxr_vhq",
+        "n_fft": 4096,
+        "hop_length": 1024,
+        "bins_per_octave": 36,
+    },
+}
+
 
 class Config:
     """Configuration for vocal analyzer features."""
@@ -30,11 +57,19 @@ class Config:
             "llm_analysis": True,
             "pitch_visualization": True,
             "key_detection": True,
+            "key_timeline": True,
         }
 
         self.extraction = {
             "model": "model_bs_roformer_ep_317_sdr_12.9755.ckpt",
             "extract_all_stems": False,
+            "segment_size": 0,
+            "overlap": 0.0,
+            "batch_size": 1,
+            "chunk_duration": 0,
+            "chunk_crossfade": 2.0,
+            "in_memory_stems": True,
+            "write_stems": "sync",
         }
 
         self.transcription = {
@@ -44,16 +79,63 @@ class Config:
         }
 
         self.analysis = {
+            "profile": "balanced",
+            "pitch_backend": "piptrack",
+            "key_window": 10.0,
+            "key_step": 5.0,
+            "key_source": "auto",
             "llm_model": "gpt-4.1-nano",
             "fallback_on_error": True,
         }
 
+        self.api = {
+            "max_in_flight": 8,
+            "timeout": 600,
+            "max_retries": 2,
+        }
+
         self.output = {
             "format": "markdown",
+            "table": "",
             "include_pitch_plot": True,
+            "plot_dpi": 300,
+            "plot_format": "png",
             "quiet_mode": False,
         }
 
+        self.cache = {
+            "enabled": True,
+            "dir": "~/.cache/vocal-analyzer/results",
+            "max_size_mb": 10240,
+            "pcm_dir": "~/.cache/vocal-analyzer/pcm",
+            "pcm_max_size_mb": 2048,
+            "models_file": "~/.cache/vocal-analyzer/models.json",
+            "models_ttl_hours": 24,
+            "incremental": True,
+        }
+
+        self.performance = {
+            "parallel_stages": True,
+            "max_workers": 2,
+            "streaming": "auto",
+            "streaming_min_duration": 1200,
+            "streaming_block_frames": 2048,
+        }
+
+        self.server = {
+            "host": "127.0.0.1",
+            "port": 8765,
+            "socket": "",
+            "workers": 1,
+            "max_queue": 16,
+            "max_finished_jobs": 256,
+        }
+
+        self.catalog = {
+            "enabled": True,
+            "path": "~/.local/share/vocal-analyzer/catalog.sqlite",
+        }
+
         # Load from file if specified
         if config_path:
             self._load_config(config_path)
@@ -98,10 +180,30 @@ class Config:
         if "analysis" in config_data:
             self.analysis.update(config_data["analysis"])
 
+        # Update API transport settings
+        if "api" in config_data:
+            self.api.update(config_data["api"])
+
         # Update output settings
         if "output" in config_data:
             self.output.update(config_data["output"])
 
+        # Update cache settings
+        if "cache" in config_data:
+            self.cache.update(config_data["cache"])
+
+        # Update performance settings
+        if "performance" in config_data:
+            self.performance.update(config_data["performance"])
+
+        # Update server settings
+        if "server" in config_data:
+            self.server.update(config_data["server"])
+
+        # Update catalog settings
+        if "catalog" in config_data:
+            self.catalog.update(config_data["catalog"])
+
     def is_enabled(self, feature):
         """Check if a feature is enabled.
 
@@ -112,3 +214,25 @@ class Config:
             bool: True if feature is enabled
         """
         return self.features.get(feature, True)
+
+    def quality_profile(self, name=None):
+        """Get the settings of an analysis quality profile.
+
+        Args:
+            name: Profile name (defaults to analysis.profile)
+
+        Returns:
+            dict: sample_rate, res_type, n_fft, hop_length and bins_per_octave,
+            plus the configured pitch_backend
+
+        Raises:
+            ValueError: if the profile is unknown
+        """
+        name = name or self.analysis["profile"]
+        if name not in QUALITY_PROFILES:
+            raise ValueError(
+                f"Unknown analysis profile {name!r} (choose from {', '.join(QUALITY_PROFILES)})"
+            )
+        profile = dict(QUALITY_PROFILES[name])
+        profile["pitch_backend"] = self.analysis["pitch_backend"]
+        return profile
@@ -1,6 +1,8 @@
 import librosa
 import numpy as np
 
+from .spectral import SpectralContext, load_spectral, spectral_settings
+
 
 def frequency_to_note(frequency):
     """Convert frequency in Hz to musical note name."""
@@ -27,20 +29,34 @@ def frequency_to_note(frequency):
     return f"{note_names[note_index]}{octave}"
 
 
-def extract_features(audio_file):
-    """Extract audio features like tempo, pitch, and screaming presence."""
-    y, sr = librosa.load(audio_file)
+def extract_features(audio_file, y=None, sr=None, spectral=None, profile=None):
+    """Extract audio features like tempo, pitch, and screaming presence.
+
+    Args:
+        audio_file: Path to audio file
+        y: Already-decoded audio samples (optional, skips loading audio_file)
+        sr: Sample rate of y (required when y is given)
+        spectral: SpectralContext shared with other stages, or a
+            StreamingContext for long recordings (optional)
+        profile: Quality profile settings (Config.quality_profile) used when
+            no spectral context is given (defaults to balanced)
+    """
+    if spectral is None:
+        if y is None:
+            spectral = load_spectral(audio_file, profile)
+        else:
+            spectral = SpectralContext(y, sr, **spectral_settings(profile))
+    sr = spectral.sr
     # Extract tempo
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-    # Extract pitches
-    pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
+    tempo, _ = librosa.beat.beat_track(
+        onset_envelope=spectral.onset_envelope, sr=sr, hop_length=spectral.hop_length
+    )
     # Get pitches with significant magnitude
-    pitches = pitches[magnitudes > np.median(magnitudes)]
-    pitches = pitches[pitches > 0]
-    if len(pitches) > 0:
-        min_pitch = float(np.min(pitches))
-        max_pitch = float(np.max(pitches))
-        mean_pitch = float(np.mean(pitches))
+    stats = spectral.pitch_statistics
+    if stats.count > 0:
+        min_pitch = float(stats.minimum)
+        max_pitch = float(stats.maximum)
+        mean_pitch = float(stats.mean)
         # Convert to notes
         min_note = frequency_to_note(min_pitch)
         max_note = frequency_to_note(max_pitch)
@@ -49,7 +65,7 @@ def extract_features(audio_file):
         min_pitch = max_pitch = mean_pitch = 0.0
         min_note = max_note = mean_note = "N/A"
     # Detect screaming: simple amplitude threshold
-    max_amp = np.max(np.abs(y))
+    max_amp = spectral.max_amplitude
     screaming = max_amp > 0.8  # Arbitrary threshold
     return {
         "tempo": float(tempo),
@@ -6,6 +6,78 @@ Based on https://github.com/jackmcarthur/musical-key-finder
 import numpy as np
 import librosa
 
+from .spectral import SpectralContext, load_spectral, spectral_settings
+
+PITCHES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+# names of all major and minor keys, in the row order of key_profiles()
+KEYS = [p + ' major' for p in PITCHES] + [p + ' minor' for p in PITCHES]
+
+# Krumhansl-Kessler profiles of major and minor keys, starting on the tonic
+MAJOR_PROFILE = [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
+MINOR_PROFILE = [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
+
+
+# Stems that carry the harmony without vocals or drums: an accompaniment
+# stem if the model produces one, otherwise the pitched instrument stems
+ACCOMPANIMENT_STEMS = ('instrumental', 'accompaniment', 'no_vocals')
+PITCHED_STEMS = ('bass', 'guitar', 'piano', 'keys', 'other')
+
+
+def harmonic_stems(stem_files):
+    """
+    Pick the separated stems to detect the key from.
+    
+    Args:
+        stem_files: dict mapping stem names to file paths (from separation)
+        
+    Returns:
+        dict of the chosen stem names to paths; empty if no stem is suitable
+    """
+    by_name = {name.lower(): (name, path) for name, path in stem_files.items()}
+    for name in ACCOMPANIMENT_STEMS:
+        if name in by_name:
+            return dict([by_name[name]])
+    return dict(by_name[name] for name in PITCHED_STEMS if name in by_name)
+
+
+def mix_down(signals):
+    """Sum decoded signals of the same sample rate, trimmed to the shortest."""
+    length = min(len(y) for y in signals)
+    mix = np.zeros(length, dtype=np.float32)
+    for y in signals:
+        mix += y[:length]
+    return mix
+
+
+def key_profiles():
+    """(24, 12) matrix of the major and minor profiles rotated to every tonic.
+
+    Row i holds the expected intensity of each pitch class (C..B) in KEYS[i].
+    """
+    major = np.array([np.roll(MAJOR_PROFILE, i) for i in range(12)])
+    minor = np.array([np.roll(MINOR_PROFILE, i) for i in range(12)])
+    return np.vstack([major, minor])
+
+
+def key_correlations(chroma_vals):
+    """Pearson correlation of pitch-class intensities with all 24 key profiles.
+
+    Args:
+        chroma_vals: (12,) intensities of one segment, or (n, 12) for n segments
+
+    Returns:
+        np.ndarray: (24,) or (n, 24) correlations, columns ordered like KEYS
+        (0 for segments without pitch-class variation, e.g. silence)
+    """
+    values = np.atleast_2d(np.asarray(chroma_vals, dtype=np.float64))
+    profiles = key_profiles()
+    profiles = (profiles - profiles.mean(axis=1, keepdims=True)) / profiles.std(axis=1, keepdims=True)
+    centered = values - values.mean(axis=1, keepdims=True)
+    std = centered.std(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corrs = np.where(std > 0, (centered / std) @ profiles.T / 12, 0.0)
+    return corrs[0] if np.ndim(chroma_vals) == 1 else corrs
+
 
 class Tonal_Fragment(object):
     """
@@ -18,9 +90,12 @@ class Tonal_Fragment(object):
         waveform: an audio file loaded by librosa, ideally separated out from any percussive sources
         sr: sampling rate of the audio, which can be obtained when the file is read with librosa
         tstart and tend: the range in seconds of the file to be analyzed; default to the beginning and end of file if not specified
+        chromagraph: precomputed chroma of the whole waveform (e.g. SpectralContext.chroma); computed here if not given
+        hop_length: hop size of the chromagraph (precomputed or computed here)
+        bins_per_octave: CQT resolution used when computing the chromagraph here
     """
     
-    def __init__(self, waveform, sr, tstart=None, tend=None):
+    def __init__(self, waveform, sr, tstart=None, tend=None, chromagraph=None, hop_length=512, bins_per_octave=24):
         self.waveform = waveform
         self.sr = sr
         self.tstart = tstart
@@ -31,36 +106,29 @@ class Tonal_Fragment(object):
         if self.tend is not None:
             self.tend = librosa.time_to_samples(self.tend, sr=self.sr)
         self.y_segment = self.waveform[self.tstart:self.tend]
-        self.chromograph = librosa.feature.chroma_cqt(y=self.y_segment, sr=self.sr, bins_per_octave=24)
+        if chromagraph is not None:
+            # reuse the shared chroma, slicing the frames covering the segment
+            fstart = None if self.tstart is None else librosa.samples_to_frames(self.tstart, hop_length=hop_length)
+            fend = None if self.tend is None else librosa.samples_to_frames(self.tend, hop_length=hop_length)
+            self.chromograph = chromagraph[:, fstart:fend]
+        else:
+            self.chromograph = librosa.feature.chroma_cqt(
+                y=self.y_segment, sr=self.sr, hop_length=hop_length, bins_per_octave=bins_per_octave
+            )
         
         # chroma_vals is the amount of each pitch class present in this time interval
-        self.chroma_vals = []
-        for i in range(12):
-            self.chroma_vals.append(np.sum(self.chromograph[i]))
-        pitches = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+        self.chroma_vals = np.sum(self.chromograph, axis=1)
         # dictionary relating pitch names to the associated intensity in the song
-        self.keyfreqs = {pitches[i]: self.chroma_vals[i] for i in range(12)} 
-        
-        keys = [pitches[i] + ' major' for i in range(12)] + [pitches[i] + ' minor' for i in range(12)]
-
-        # use of the Krumhansl-Schmuckler key-finding algorithm, which compares the chroma
-        # data above to typical profiles of major and minor keys:
-        maj_profile = [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
-        min_profile = [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
-
-        # finds correlations between the amount of each pitch class in the time interval and the above profiles,
-        # starting on each of the 12 pitches. then creates dict of the musical keys (major/minor) to the correlation
-        self.min_key_corrs = []
-        self.maj_key_corrs = []
-        for i in range(12):
-            key_test = [self.keyfreqs.get(pitches[(i + m) % 12]) for m in range(12)]
-            # correlation coefficients (strengths of correlation for each key)
-            self.maj_key_corrs.append(round(np.corrcoef(maj_profile, key_test)[1, 0], 3))
-            self.min_key_corrs.append(round(np.corrcoef(min_profile, key_test)[1, 0], 3))
-
-        # names of all major and minor keys
-        self.key_dict = {**{keys[i]: self.maj_key_corrs[i] for i in range(12)}, 
-                         **{keys[i + 12]: self.min_key_corrs[i] for i in range(12)}}
+        self.keyfreqs = {PITCHES[i]: self.chroma_vals[i] for i in range(12)} 
+
+        # use of the Krumhansl-Schmuckler key-finding algorithm, which correlates the chroma
+        # data above with the major and minor profiles starting on each of the 12 pitches
+        corrs = np.round(key_correlations(self.chroma_vals), 3)
+        self.maj_key_corrs = corrs[:12].tolist()
+        self.min_key_corrs = corrs[12:].tolist()
+
+        # dict of the musical keys (major/minor) to the correlation
+        self.key_dict = dict(zip(KEYS, corrs.tolist()))
         
         # this attribute represents the key determined by the algorithm
         self.key = max(self.key_dict, key=self.key_dict.get)
@@ -77,31 +145,128 @@ class Tonal_Fragment(object):
                 self.altbestcorr = corr
 
 
-def find_key(audio_file):
+def key_timeline(chromagraph, sr, hop_length, window=10.0, step=5.0):
+    """
+    Find the key of every section of a piece from one chromagram.
+    
+    The chroma is summed over sliding windows with a cumulative sum, and all
+    windows are correlated with all 24 key profiles in one matrix product.
+    Consecutive windows with the same key are merged into sections.
+    
+    Args:
+        chromagraph: (12, frames) chroma of the whole piece
+        sr: sampling rate of the analyzed audio
+        hop_length: hop size of the chromagraph
+        window: window length in seconds
+        step: distance between window starts in seconds
+        
+    Returns:
+        dict with 'window' and 'step' (seconds), 'sections' (list of dicts with
+        'start', 'end', 'key' and mean 'correlation') and 'modulations' (list
+        of dicts with 'time', 'from' and 'to')
+    """
+    n_frames = chromagraph.shape[1]
+    if n_frames == 0:
+        # Nothing to analyze (empty or silent input)
+        return {'window': window, 'step': step, 'sections': [], 'modulations': []}
+    frames_per_second = sr / hop_length
+    window_frames = min(max(1, int(round(window * frames_per_second))), max(n_frames, 1))
+    step_frames = max(1, int(round(step * frames_per_second)))
+
+    starts = np.arange(0, max(n_frames - window_frames, 0) + 1, step_frames)
+    if starts[-1] + window_frames < n_frames:
+        # one more window so the end of the piece is covered
+        starts = np.append(starts, n_frames - window_frames)
+    ends = starts + window_frames
+
+    cumulative = np.concatenate(
+        [np.zeros((12, 1)), np.cumsum(chromagraph, axis=1, dtype=np.float64)], axis=1
+    )
+    window_vals = (cumulative[:, ends] - cumulative[:, starts]).T
+    corrs = key_correlations(window_vals)
+    best = np.argmax(corrs, axis=1)
+    best_corrs = corrs[np.arange(len(best)), best]
+
+    # window centers, and boundaries halfway between consecutive centers
+    centers = (starts + ends) / 2 / frames_per_second
+    duration = n_frames / frames_per_second
+    bounds = np.concatenate([[0.0], (centers[:-1] + centers[1:]) / 2, [duration]])
+
+    sections = []
+    modulations = []
+    first = 0
+    for i in range(1, len(best) + 1):
+        if i < len(best) and best[i] == best[first]:
+            continue
+        sections.append({
+            'start': round(float(bounds[first]), 2),
+            'end': round(float(bounds[i]), 2),
+            'key': KEYS[best[first]],
+            'correlation': round(float(np.mean(best_corrs[first:i])), 3),
+        })
+        if i < len(best):
+            modulations.append({
+                'time': round(float(bounds[i]), 2),
+                'from': KEYS[best[first]],
+                'to': KEYS[best[i]],
+            })
+        first = i
+
+    return {'window': window, 'step': step, 'sections': sections, 'modulations': modulations}
+
+
+def find_key(audio_file, y=None, sr=None, spectral=None, profile=None, timeline=None, source=None):
     """
     Find the musical key of an audio file.
     
     Args:
         audio_file: Path to audio file
+        y: Already-decoded audio samples (optional, skips loading audio_file)
+        sr: Sample rate of y (required when y is given)
+        spectral: SpectralContext of the audio shared with other stages (optional)
+        profile: Quality profile settings used when no spectral context is given
+        timeline: dict with 'window' and 'step' seconds to also find the key of
+            every section (see key_timeline), or None
+        source: description of already-harmonic audio (e.g. separated
+            instrument stems), which is analyzed as is; None for a full mix,
+            whose harmonic part is first separated with HPSS
         
     Returns:
-        dict with 'key', 'correlation', 'alt_key', and 'alt_correlation' (if applicable)
+        dict with 'key', 'correlation', 'alt_key', and 'alt_correlation' (if applicable),
+        'source' (what the key was detected from), plus 'timeline' when requested
     """
-    # Load audio file
-    y, sr = librosa.load(audio_file)
+    # Load audio file unless the caller already decoded it
+    if spectral is None:
+        if y is None:
+            spectral = load_spectral(audio_file, profile)
+        else:
+            spectral = SpectralContext(y, sr, **spectral_settings(profile))
     
     # Separate harmonic and percussive components
     # Analysis is most accurate using only the harmonic part
-    y_harmonic, y_percussive = librosa.effects.hpss(y)
+    if source is None:
+        harmonic = spectral.harmonic
+        source = 'full mix (HPSS)'
+    else:
+        harmonic = spectral
     
     # Create tonal fragment and analyze
-    tonal_fragment = Tonal_Fragment(y_harmonic, sr)
+    tonal_fragment = Tonal_Fragment(
+        harmonic.y, harmonic.sr, chromagraph=harmonic.chroma, hop_length=harmonic.hop_length
+    )
     
     result = {
         'key': tonal_fragment.key,
         'correlation': tonal_fragment.bestcorr,
         'alt_key': tonal_fragment.altkey,
-        'alt_correlation': tonal_fragment.altbestcorr
+        'alt_correlation': tonal_fragment.altbestcorr,
+        'source': source
     }
+
+    if timeline is not None:
+        # reuses the chroma computed for the whole-piece key
+        result['timeline'] = key_timeline(
+            harmonic.chroma, harmonic.sr, harmonic.hop_length, **timeline
+        )
     
     return result
@@ -1,7 +1,8 @@
-from openai import OpenAI
 import os
 import logging
 
+from .openai_transport import get_transport
+
 
 class LLMAnalyzer:
     """Analyze vocal style using OpenAI's GPT model."""
@@ -11,7 +12,19 @@ class LLMAnalyzer:
         self.features = features
 
     def analyze(self):
-        """Craft a prompt and query the LLM for vocal style analysis."""
+        """Craft a prompt and query the LLM for vocal style analysis.
+
+        Runs on the shared OpenAI transport, so connections are reused across calls.
+        """
+        transport = get_transport()
+        return transport.run(self.analyze_async(transport))
+
+    async def analyze_async(self, transport=None):
+        """Asyncio version of analyze().
+
+        Args:
+            transport: OpenAITransport to use (defaults to the shared one)
+        """
         # Convert NumPy values to Python floats for proper formatting
         min_pitch = float(self.features["min_pitch"])
         max_pitch = float(self.features["max_pitch"])
@@ -55,11 +68,13 @@ class LLMAnalyzer:
                 logging.warning("OPENAI_API_KEY not set - using fallback analysis")
                 return self._generate_fallback_analysis()
 
-            client = OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-4.1-nano",
-                messages=[{"role": "user", "content": prompt}]
-            )
+            async def call(client):
+                return await client.chat.completions.create(
+                    model="gpt-4.1-nano",
+                    messages=[{"role": "user", "content": prompt}]
+                )
+
+            response = await (transport or get_transport()).request(call)
             return response.choices[0].message.content
         except Exception as e:
             logging.warning(f"Error during LLM analysis: {e}")
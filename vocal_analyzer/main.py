@@ -1,20 +1,1016 @@
 import argparse
+import glob
+import json
 import os
-from .config import Config
-from .vocal_extractor import extract_vocals, extract_all_stems, get_model_stem_info
-from .transcriber import transcribe_audio
-from .feature_extractor import extract_features
-from .range_analyzer import RangeAnalyzer
-from .llm_analyzer import LLMAnalyzer
-from .output_generator import generate_output
-from .key_finder import find_key
+import sys
+import threading
+from types import SimpleNamespace
+from .config import Config, QUALITY_PROFILES
+from .pipeline import Pipeline, Stage
+
+# Stage modules pull in librosa, numba, matplotlib, openai, pydub and
+# audio_separator, so they are imported inside the functions that use them:
+# `va --help`, `--list-models`, `--show-pipeline` and config errors don't
+# pay for dependencies they never touch.
+
+class AnalysisSession:
+    """Per-run state shared by the analysis stages.
+
+    Owns a cache of decoded audio keyed by (path, sample rate) so each source
+    file is decoded and resampled once, no matter how many stages read it,
+    plus one SpectralContext per decoded signal so STFT/piptrack/chroma are
+    computed once as well. When a StageScheduler is attached, decoded audio
+    can be published to worker processes through shared memory. With a
+    PCMCache, decodes also persist across runs.
+
+    Audio is decoded and analyzed as the quality profile (Config.quality_profile)
+    specifies; the balanced profile is used if none is given.
+
+    The separation stage hands the samples of the stems it produced to the
+    session (provide_audio), so they are resampled from memory rather than
+    read back from the files, which may still be being written in the
+    background (wait_for_file, wait_for_writes).
+    """
+
+    def __init__(self, profile=None, scheduler=None, pcm_cache=None):
+        self.profile = profile or dict(QUALITY_PROFILES["balanced"])
+        self.sample_rate = self.profile["sample_rate"]
+        self.scheduler = scheduler
+        self.pcm_cache = pcm_cache
+        self._audio = {}
+        self._spectral = {}
+        self._shared = {}
+        self._separated = {}
+        self._durations = {}
+        self._digests = {}
+        self._writes = {}
+        self._after_writes = []
+        # Pipeline stages run on threads and may request the same audio
+        self._lock = threading.RLock()
+
+    def load_audio(self, audio_file, sr=None):
+        """Decode an audio file, reusing a previous decode of the same file.
+
+        Args:
+            audio_file: Path to audio file
+            sr: Target sample rate (defaults to the session sample rate)
+
+        Returns:
+            tuple: (samples, sample_rate) as returned by librosa.load
+            (a read-only memory map when served from the PCM cache)
+        """
+        import librosa
+
+        sr = sr or self.sample_rate
+        res_type = self.profile["res_type"]
+        key = (os.path.abspath(audio_file), sr)
+        with self._lock:
+            if key not in self._audio:
+                # Separated samples are only needed until they are decoded
+                separated = self._separated.pop(key[0], None)
+                if separated is not None:
+                    import numpy as np
+
+                    y, native_sr = separated
+                    if y.ndim == 2:
+                        y = y.mean(axis=1)  # mono downmix, as librosa.load does
+                    y = np.ascontiguousarray(y, dtype=np.float32)
+                    if native_sr != sr:
+                        y = librosa.resample(y, orig_sr=native_sr, target_sr=sr, res_type=res_type)
+                    self._audio[key] = (y, sr)
+                    return self._audio[key]
+                self.wait_for_file(audio_file)
+                if self.pcm_cache is not None:
+                    self._audio[key] = self.pcm_cache.load(audio_file, sr, res_type)
+                else:
+                    self._audio[key] = librosa.load(audio_file, sr=sr, res_type=res_type)
+            return self._audio[key]
+
+    def spectral(self, audio_file, sr=None):
+        """Return the shared SpectralContext for an audio file.
+
+        Args:
+            audio_file: Path to audio file
+            sr: Target sample rate (defaults to the session sample rate)
+
+        Returns:
+            SpectralContext: memoized spectral features of the decoded audio
+        """
+        sr = sr or self.sample_rate
+        key = (os.path.abspath(audio_file), sr)
+        with self._lock:
+            if key not in self._spectral:
+                y, sr = self.load_audio(audio_file, sr)
+                from .spectral import SpectralContext, spectral_settings
+
+                self._spectral[key] = SpectralContext(y, sr, **spectral_settings(self.profile))
+            return self._spectral[key]
+
+    def share_audio(self, audio_file, sr=None):
+        """Publish decoded audio in shared memory for worker processes.
+
+        Args:
+            audio_file: Path to audio file
+            sr: Target sample rate (defaults to the session sample rate)
+
+        Returns:
+            SharedAudioHandle: picklable reference for the scheduler workers
+        """
+        sr = sr or self.sample_rate
+        key = (os.path.abspath(audio_file), sr)
+        with self._lock:
+            if key not in self._shared:
+                y, sr = self.load_audio(audio_file, sr)
+                from .scheduler import SharedAudio
+
+                self._shared[key] = SharedAudio(y, sr)
+            return self._shared[key].handle
+
+    def provide_audio(self, audio_file, y, sr, write=None):
+        """Hand over separated samples, so load_audio doesn't read audio_file back.
+
+        Args:
+            audio_file: Path of the stem file
+            y: Samples, shaped (frames,) or (frames, channels)
+            sr: Their sample rate
+            write: Future of the background write of audio_file (None if it
+                is already written)
+        """
+        key = os.path.abspath(audio_file)
+        with self._lock:
+            self._separated[key] = (y, sr)
+            self._durations[key] = len(y) / sr
+            if write is not None:
+                self._writes[key] = write
+
+    def wait_for_file(self, audio_file):
+        """Wait until audio_file is on disk, if it is being written in the background."""
+        with self._lock:
+            write = self._writes.get(os.path.abspath(audio_file))
+        if write is not None:
+            write.result()
+
+    def after_writes(self, callback):
+        """Call callback once all background writes are done (at once if there are none)."""
+        with self._lock:
+            if self._writes:
+                self._after_writes.append(callback)
+                return
+        callback()
+
+    def wait_for_writes(self):
+        """Wait for all background writes, then run the after_writes callbacks."""
+        with self._lock:
+            writes = list(self._writes.values())
+            callbacks, self._after_writes = self._after_writes, []
+        try:
+            for write in writes:
+                write.result()
+        finally:
+            # A failed write fails this run only, not the rest of the session
+            with self._lock:
+                self._writes.clear()
+        for callback in callbacks:
+            callback()
+
+    def set_audio_digest(self, audio_file, digest):
+        """Identify audio_file by digest in result cache keys instead of hashing it."""
+        with self._lock:
+            self._digests[os.path.abspath(audio_file)] = digest
+
+    def audio_digest(self, audio_file):
+        """Content hash of an audio file for result cache keys.
+
+        Stems are identified by the separation that produced them (see
+        set_audio_digest), so they are not read back just to be hashed.
+        """
+        from .cache import file_digest
+
+        with self._lock:
+            digest = self._digests.get(os.path.abspath(audio_file))
+        if digest is None:
+            self.wait_for_file(audio_file)
+            digest = file_digest(audio_file)
+        return digest
+
+    def audio_duration(self, audio_file):
+        """Duration in seconds (None if unknown), from separated samples when available."""
+        from .streaming import audio_duration
+
+        with self._lock:
+            duration = self._durations.get(os.path.abspath(audio_file))
+        if duration is None:
+            self.wait_for_file(audio_file)
+            duration = audio_duration(audio_file)
+        return duration
+
+    def clear(self):
+        """Release all decoded audio and spectral data held by the session."""
+        with self._lock:
+            self._separated.clear()
+            self._durations.clear()
+            self._digests.clear()
+            self._writes.clear()
+            self._after_writes = []
+            self._audio.clear()
+            self._spectral.clear()
+            for shared in self._shared.values():
+                shared.close()
+            self._shared.clear()
+
+
+def make_result_cache(config):
+    """Build the ResultCache described by the [cache] config section."""
+    from .cache import ResultCache
+
+    max_size_mb = config.cache["max_size_mb"]
+    max_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+    return ResultCache(config.cache["dir"], max_bytes=max_bytes)
+
+
+def make_pcm_cache(config):
+    """Build the PCMCache described by the [cache] config section (or None)."""
+    from .cache import PCMCache
+
+    max_size_mb = config.cache["pcm_max_size_mb"]
+    if not max_size_mb:
+        return None
+    return PCMCache(config.cache["pcm_dir"], max_bytes=int(max_size_mb * 1024 * 1024))
+
+
+AUDIO_EXTENSIONS = (".wav", ".mp3")
+
+
+def collect_input_files(inputs):
+    """Expand CLI inputs into a list of audio files.
+
+    Each input may be a file, a directory (searched recursively for WAV/MP3
+    files), a glob pattern, or "-" to read one path per line from stdin.
+
+    Args:
+        inputs: List of input arguments
+
+    Returns:
+        list: Audio file paths in the order given, without duplicates
+    """
+    files = []
+    for item in inputs:
+        if item == "-":
+            candidates = [line.strip() for line in sys.stdin if line.strip()]
+        elif os.path.isdir(item):
+            candidates = []
+            for root, _, names in os.walk(item):
+                # Skip our own analysis output directories
+                if os.path.basename(root).endswith("-analysis"):
+                    continue
+                candidates.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.lower().endswith(AUDIO_EXTENSIONS)
+                )
+            candidates.sort()
+        elif glob.has_magic(item):
+            candidates = sorted(
+                path
+                for path in glob.glob(item, recursive=True)
+                if path.lower().endswith(AUDIO_EXTENSIONS)
+            )
+        else:
+            candidates = [item]
+
+        for path in candidates:
+            if path not in files:
+                files.append(path)
+    return files
+
+
+def default_output_dir(input_file, output_root=None):
+    """Return the analysis directory for an input file.
+
+    Args:
+        input_file: Path to input audio file
+        output_root: Directory to create the analysis directory in
+            (defaults to the directory containing the input file)
+    """
+    input_basename = os.path.splitext(os.path.basename(input_file))[0]
+    if output_root is None:
+        output_root = os.path.dirname(input_file)
+    return os.path.join(output_root, f"{input_basename}-analysis")
+
+
+def batch_output_dirs(input_files, output_root=None):
+    """Return the analysis directory of every file in a batch.
+
+    Files whose analysis directories would coincide (the same name in
+    different folders under one -o, or song.wav next to song.mp3) get a
+    short digest of their absolute path added to the directory name, so
+    one file never overwrites another's results. The digest is stable, so
+    re-runs find the same directories.
+
+    Args:
+        input_files: Audio file paths
+        output_root: Directory to create the analysis directories in
+            (defaults to the directory containing each input file)
+
+    Returns:
+        list: Output directory for each input file, in order
+    """
+    import hashlib
+
+    output_dirs = [default_output_dir(input_file, output_root) for input_file in input_files]
+    taken = {}
+    for output_dir in output_dirs:
+        key = os.path.normcase(os.path.abspath(output_dir))
+        taken[key] = taken.get(key, 0) + 1
+    for index, input_file in enumerate(input_files):
+        if taken[os.path.normcase(os.path.abspath(output_dirs[index]))] > 1:
+            digest = hashlib.sha256(os.path.abspath(input_file).encode()).hexdigest()[:8]
+            output_dirs[index] = output_dirs[index][: -len("-analysis")] + f"-{digest}-analysis"
+    return output_dirs
+
+
+def _cache_lookup(run, stage, audio_file, restore_to=None, **settings):
+    """Look up a stage result in the run's result cache.
+
+    Returns:
+        tuple: (key, hit) where hit is (value, files) or None; key is None
+        when caching is disabled
+    """
+    if run.cache is None:
+        return None, None
+    key = run.cache.key(stage, run.session.audio_digest(audio_file), **settings)
+    return key, run.cache.get(stage, key, restore_to=restore_to)
+
+
+def _cache_store(run, stage, key, value, files=None):
+    """Store a stage result in the run's result cache (if enabled)."""
+    if run.cache is not None and key is not None:
+        run.cache.put(stage, key, value, files=files)
+
+
+# [extraction] settings that affect how stems are handed over, not their content
+STEM_HANDOFF_SETTINGS = ("in_memory_stems", "write_stems")
+
+
+def _separation_settings(config):
+    """The [extraction] settings the separated stems depend on."""
+    return {
+        name: value for name, value in config.extraction.items() if name not in STEM_HANDOFF_SETTINGS
+    }
+
+
+def _separation_stage(run, input_file, output_dir):
+    """Stage: extract vocals (or all stems) from the input file."""
+    config, model, quiet = run.config, run.model, run.quiet
+
+    if not config.is_enabled("vocal_extraction"):
+        # Skip extraction, assume vocal file already exists
+        if not quiet:
+            print("Vocal extraction disabled, looking for existing vocal file...")
+        return {"vocal_file": input_file, "output_files": [], "stem_files": {}}
+
+    key, hit = _cache_lookup(
+        run, "separation", input_file, restore_to=output_dir,
+        model=model, extract_all=run.extract_all, settings=_separation_settings(config),
+    )
+    # Stem samples to analyze straight from memory (see AnalysisSession.provide_audio)
+    capture = {} if config.extraction["in_memory_stems"] else None
+    if hit is not None:
+        stem_files = hit[1]
+        if not quiet:
+            print(f"Found cached separation from {model}, skipping extraction:")
+            for stem_name, file_path in stem_files.items():
+                print(f"  {stem_name}: {os.path.basename(file_path)}")
+    elif not run.extract_all:
+        from .vocal_extractor import extract_vocals
+
+        # Extract vocals only (original behavior)
+        stem_files = {"vocals": extract_vocals(input_file, output_dir, model, capture, quiet)}
+    else:
+        from .vocal_extractor import extract_all_stems, get_model_stem_info, model_stem_names
+
+        # Extract all available stems
+        if not quiet:
+            print(f"Extracting all stems using model: {model}")
+
+            # Show what stems this model can produce
+            model_info = get_model_stem_info(model)
+            if model_info:
+                print(f"This model can produce: {', '.join(model_stem_names(model_info))}")
+
+        stem_files = extract_all_stems(input_file, output_dir, model, capture, quiet)
+
+        if not quiet:
+            print("All stems extracted successfully:")
+            for stem_name, file_path in stem_files.items():
+                print(f"  {stem_name}: {os.path.basename(file_path)}")
+
+    if hit is None:
+        for path, (samples, sample_rate, write) in (capture or {}).items():
+            run.session.provide_audio(path, samples, sample_rate, write)
+        # Stem files may still be being written; cache them once they are complete
+        run.session.after_writes(
+            lambda: _cache_store(run, "separation", key, {}, files=stem_files)
+        )
+    _set_stem_digests(run, input_file, stem_files)
+
+    # For analysis, we still need the vocals file specifically
+    vocal_file = stem_files.get("vocals") or stem_files.get("Vocals")
+    if not vocal_file:
+        # If no vocals stem, try to find the best one for analysis
+        if "vocal" in stem_files:
+            vocal_file = stem_files["vocal"]
+        else:
+            # Use the first available stem as fallback
+            vocal_file = next(iter(stem_files.values()))
+            if not quiet:
+                print(f"No vocals stem found, using {list(stem_files.keys())[0]} for analysis")
+
+    return {
+        "vocal_file": vocal_file,
+        "output_files": list(stem_files.values()),
+        "stem_files": stem_files,
+    }
+
+
+def _set_stem_digests(run, input_file, stem_files):
+    """Identify stems by the input content, model and settings that produced them.
+
+    Result cache keys of the stages analyzing a stem then don't require
+    hashing (reading back) the stem file.
+    """
+    import hashlib
+    from .cache import file_digest
+
+    separation = json.dumps(
+        [file_digest(input_file), run.model, run.extract_all, _separation_settings(run.config)],
+        sort_keys=True,
+    )
+    for stem_name, path in stem_files.items():
+        digest = hashlib.sha256(f"{separation}:{stem_name}".encode()).hexdigest()
+        run.session.set_audio_digest(path, digest)
+
+
+def _transcription_stage(run, vocal_file):
+    """Stage: transcribe the vocals."""
+    key, hit = _cache_lookup(
+        run, "transcription", vocal_file, settings=run.config.transcription
+    )
+    if hit is not None:
+        return {"transcription": hit[0]}
+
+    from .transcriber import transcribe_audio
+
+    run.session.wait_for_file(vocal_file)
+    transcription = transcribe_audio(vocal_file)
+    _cache_store(run, "transcription", key, transcription)
+    return {"transcription": transcription}
+
+
+def _use_streaming(run, audio_file):
+    """Whether to analyze audio_file block-wise instead of decoding it whole.
+
+    performance.streaming is "always", "never" or "auto"; in auto mode files
+    at least streaming_min_duration seconds long are streamed.
+    """
+    config = run.config
+    mode = config.performance["streaming"]
+    if mode == "always":
+        return True
+    if mode != "auto":
+        return False
+    duration = run.session.audio_duration(audio_file)
+    return duration is not None and duration >= config.performance["streaming_min_duration"]
+
+
+def _vocal_analysis_stage(run, vocal_file, output_dir):
+    """Stage: feature extraction and (if enabled) range analysis on the vocals.
+
+    Both run together so they share one spectral context, in a worker
+    process when a scheduler is attached to the session. Long recordings
+    are streamed from disk with bounded memory instead of decoded whole.
+    """
+    session = run.session
+    range_analysis = run.config.is_enabled("range_analysis")
+    if not range_analysis and not run.quiet:
+        print("Range analysis disabled, skipping...")
+
+    streaming = _use_streaming(run, vocal_file)
+    key, hit = _cache_lookup(
+        run, "vocal_analysis", vocal_file,
+        range_analysis=range_analysis, profile=session.profile, streaming=streaming,
+    )
+    if hit is not None:
+        value, _ = hit
+        return {
+            "features": value["features"],
+            "range_results": _with_plot_file(run, value["range_results"], vocal_file, output_dir),
+        }
+
+    from .feature_extractor import extract_features
+    from .range_analyzer import RangeAnalyzer
+    from .scheduler import run_streaming_vocal_stages, run_vocal_stages
+    from .streaming import streaming_context
+
+    if streaming:
+        session.wait_for_file(vocal_file)
+        block_frames = run.config.performance["streaming_block_frames"]
+        if not run.quiet:
+            print("Long recording, streaming vocal analysis...")
+        if session.scheduler is not None:
+            features, range_results = session.scheduler.submit(
+                run_streaming_vocal_stages,
+                vocal_file,
+                output_dir,
+                range_analysis,
+                session.profile,
+                block_frames,
+            ).result()
+        else:
+            context = streaming_context(vocal_file, session.profile, block_frames)
+            features = extract_features(vocal_file, spectral=context)
+            range_results = {}
+            if range_analysis:
+                range_results = RangeAnalyzer(vocal_file, output_dir, spectral=context).analyze()
+    elif session.scheduler is not None:
+        features, range_results = session.scheduler.submit(
+            run_vocal_stages,
+            session.share_audio(vocal_file),
+            vocal_file,
+            output_dir,
+            range_analysis,
+            session.profile,
+        ).result()
+    else:
+        # Extract features (always needed for range analysis)
+        vocal_spectral = session.spectral(vocal_file)
+        features = extract_features(vocal_file, spectral=vocal_spectral)
+
+        range_results = {}
+        if range_analysis:
+            range_analyzer = RangeAnalyzer(vocal_file, output_dir, spectral=vocal_spectral)
+            range_results = range_analyzer.analyze()
+
+    _cache_store(
+        run, "vocal_analysis", key, {"features": features, "range_results": range_results}
+    )
+    return {
+        "features": features,
+        "range_results": _with_plot_file(run, range_results, vocal_file, output_dir),
+    }
+
+
+def _plot_enabled(config):
+    """Whether the pitch distribution plot is rendered."""
+    return (
+        config.is_enabled("range_analysis")
+        and config.is_enabled("pitch_visualization")
+        and config.output["include_pitch_plot"]
+    )
+
+
+def _with_plot_file(run, range_results, vocal_file, output_dir):
+    """Point range_results at the plot the pitch_plot stage will render.
+
+    The path is known up front, so the report can link the plot without
+    waiting for it to be rendered.
+    """
+    if range_results.get("histogram") and _plot_enabled(run.config):
+        from .range_analyzer import pitch_plot_path
+
+        plot_format = run.config.output["plot_format"]
+        range_results = dict(range_results, plot_file=pitch_plot_path(vocal_file, output_dir, plot_format))
+    return range_results
+
+
+def _pitch_plot_stage(run, vocal_file, range_results):
+    """Stage: render the pitch distribution plot (off the report's critical path)."""
+    plot_file = range_results.get("plot_file")
+    if not plot_file:
+        return {"plot_file": None}
+
+    dpi = run.config.output["plot_dpi"]
+    output_dir = os.path.dirname(plot_file)
+    key, hit = _cache_lookup(
+        run, "pitch_plot", vocal_file, restore_to=output_dir,
+        histogram=range_results["histogram"], dpi=dpi, name=os.path.basename(plot_file),
+    )
+    if hit is not None:
+        return {"plot_file": hit[1]["plot"]}
+
+    from .range_analyzer import render_pitch_plot
+
+    if run.session.scheduler is not None:
+        run.session.scheduler.submit(render_pitch_plot, range_results, plot_file, dpi).result()
+    else:
+        render_pitch_plot(range_results, plot_file, dpi)
+    _cache_store(run, "pitch_plot", key, {}, files={"plot": plot_file})
+    return {"plot_file": plot_file}
+
+
+def _key_timeline_settings(config):
+    """find_key timeline settings, or None when the key timeline is disabled."""
+    if not config.is_enabled("key_timeline"):
+        return None
+    return {"window": config.analysis["key_window"], "step": config.analysis["key_step"]}
+
+
+def _key_from_stems(config, extract_all):
+    """Whether key detection waits for separated stems to use instead of HPSS."""
+    return (
+        extract_all
+        and config.is_enabled("vocal_extraction")
+        and config.analysis["key_source"] == "auto"
+    )
+
+
+def _key_detection_stage(run, input_file, stem_files=None):
+    """Stage: find the musical key from harmonic stems, or from the full mix with HPSS."""
+    from .key_finder import find_key, harmonic_stems, mix_down
+    from .scheduler import run_key_stage
+
+    session = run.session
+    timeline = _key_timeline_settings(run.config)
+    stems = harmonic_stems(stem_files or {})
+    source = f"separated stems ({', '.join(stems)})" if stems else None
+    # Stems are identified by their digests, which cover the model and the
+    # separation settings that produced them
+    key, hit = _cache_lookup(
+        run, "key_detection", input_file, profile=session.profile, timeline=timeline,
+        stems={name: session.audio_digest(path) for name, path in stems.items()},
+    )
+    if hit is not None:
+        return {"key_info": hit[0]}
+
+    if not run.quiet:
+        print(f"Detecting key from {source or 'the full mix (HPSS)'}")
+    if session.scheduler is not None:
+        if stems:
+            audio = [session.share_audio(path) for path in stems.values()]
+        else:
+            audio = session.share_audio(input_file)
+        key_info = session.scheduler.submit(
+            run_key_stage, audio, input_file, session.profile, timeline, source
+        ).result()
+    elif stems:
+        from .spectral import SpectralContext, spectral_settings
+
+        y = mix_down([session.load_audio(path)[0] for path in stems.values()])
+        spectral = SpectralContext(y, session.sample_rate, **spectral_settings(session.profile))
+        key_info = find_key(input_file, spectral=spectral, timeline=timeline, source=source)
+    else:
+        key_info = find_key(input_file, spectral=session.spectral(input_file), timeline=timeline)
+    _cache_store(run, "key_detection", key, key_info)
+    return {"key_info": key_info}
+
+
+def _llm_analysis_stage(run, transcription, features):
+    """Stage: LLM vocal style analysis."""
+    from .llm_analyzer import LLMAnalyzer
+
+    llm_analyzer = LLMAnalyzer(transcription, features)
+    return {"llm_results": llm_analyzer.analyze()}
+
+
+OUTPUT_FORMATS = ("markdown", "json", "csv", "parquet")
+
+
+def output_formats(config):
+    """Output formats from output.format (a name or a list of names).
+
+    Raises:
+        ValueError: for an unknown format
+        Exception: for parquet when pyarrow is not installed
+    """
+    formats = config.output["format"]
+    if isinstance(formats, str):
+        formats = [formats]
+    for name in formats:
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"Unknown output format {name!r} (choose from {', '.join(OUTPUT_FORMATS)})"
+            )
+    if "parquet" in formats:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise Exception("Parquet output requires pyarrow (pip install vocal-analyzer[parquet])")
+    return formats
+
+
+def results_table_path(config, output_root=None):
+    """Results table path without extension (.csv file / .parquet directory).
+
+    output.table if set, else vocal_analysis in output_root (the -o
+    directory) or the current directory, so every file analyzed by one
+    invocation shares one table.
+    """
+    table = config.output["table"]
+    if table:
+        return os.path.splitext(os.path.abspath(os.path.expanduser(table)))[0]
+    return os.path.join(os.path.abspath(output_root or os.curdir), "vocal_analysis")
+
+
+def _report_stage(
+    run, output_dir, range_results, llm_results, input_file, key_info, transcription, features
+):
+    """Stage: write the Markdown report and any structured outputs (output.format)."""
+    from .output_generator import (
+        append_csv, append_parquet, generate_json, generate_output, results_document, results_row,
+    )
+
+    formats = output_formats(run.config)
+    # The Markdown report is always written; the other formats come alongside it
+    analysis_file = generate_output(
+        output_dir, range_results, llm_results, input_file, key_info, transcription
+    )
+    data_files = []
+    if set(formats) - {"markdown"}:
+        profile = run.session.profile
+        document = results_document(
+            input_file, range_results, features, key_info, transcription, llm_results,
+            profile=run.config.analysis["profile"],
+            pitch_backend=profile.get("pitch_backend"),
+            model=run.model if run.config.is_enabled("vocal_extraction") else None,
+            analysis_file=analysis_file,
+        )
+        table = results_table_path(run.config)
+        if "json" in formats:
+            data_files.append(generate_json(output_dir, document))
+        if "csv" in formats:
+            data_files.append(append_csv(table + ".csv", results_row(document)))
+        if "parquet" in formats:
+            data_files.append(append_parquet(table + ".parquet", results_row(document)))
+    return {"analysis_file": analysis_file, "data_files": data_files}
+
+
+def build_pipeline(config, scheduler=None, extract_all=False, model=None):
+    """Build the analysis DAG for a config.
+
+    Args:
+        config: Config instance (feature toggles enable/disable stages)
+        scheduler: StageScheduler running CPU stages in worker processes, if any
+        extract_all: All stems are extracted (key detection can then use the
+            harmonic stems instead of the mix)
+        model: Separation model filename (part of the stage settings)
+
+    Returns:
+        Pipeline: stages wired by their declared inputs and outputs
+    """
+    # CPU stages in this process run one at a time; with a process pool,
+    # as many as there are workers
+    pipeline = Pipeline(cpu_slots=scheduler.max_workers if scheduler else 1)
+    profile = config.quality_profile()
+    vocal_extraction = config.is_enabled("vocal_extraction")
+    pipeline.add(Stage(
+        "separation", _separation_stage,
+        inputs=["input_file", "output_dir"],
+        outputs=["vocal_file", "output_files", "stem_files"],
+        settings={
+            "vocal_extraction": vocal_extraction,
+            "model": model,
+            "extract_all": extract_all,
+            "extraction": _separation_settings(config),
+        },
+        code=["main", "vocal_extractor"],
+    ))
+    pipeline.add(Stage(
+        "transcription", _transcription_stage,
+        inputs=["vocal_file"],
+        outputs=["transcription"],
+        kind="io",
+        enabled=config.is_enabled("transcription"),
+        defaults={"transcription": ""},
+        skip_message="Transcription disabled, skipping...",
+        settings=config.transcription,
+        code=["main", "transcriber"],
+    ))
+    pipeline.add(Stage(
+        "vocal_analysis", _vocal_analysis_stage,
+        inputs=["vocal_file", "output_dir"],
+        outputs=["features", "range_results"],
+        settings={
+            "range_analysis": config.is_enabled("range_analysis"),
+            "plot": _plot_enabled(config),
+            "plot_format": config.output["plot_format"],
+            "profile": profile,
+            "streaming": {
+                name: value for name, value in config.performance.items() if name.startswith("streaming")
+            },
+        },
+        code=["main", "scheduler", "feature_extractor", "range_analyzer", "spectral", "streaming", "pitch"],
+    ))
+    pipeline.add(Stage(
+        "pitch_plot", _pitch_plot_stage,
+        inputs=["vocal_file", "range_results"],
+        outputs=["plot_file"],
+        enabled=_plot_enabled(config),
+        settings={"dpi": config.output["plot_dpi"]},
+        code=["main", "range_analyzer"],
+    ))
+    pipeline.add(Stage(
+        "key_detection", _key_detection_stage,
+        # With all stems, wait for them rather than running HPSS on the mix
+        inputs=["input_file", "stem_files"] if _key_from_stems(config, extract_all) else ["input_file"],
+        outputs=["key_info"],
+        enabled=config.is_enabled("key_detection"),
+        skip_message="Key detection disabled, skipping...",
+        settings={
+            "profile": profile,
+            "timeline": _key_timeline_settings(config),
+            "key_source": config.analysis["key_source"],
+        },
+        code=["main", "scheduler", "key_finder", "spectral"],
+    ))
+    pipeline.add(Stage(
+        "llm_analysis", _llm_analysis_stage,
+        inputs=["transcription", "features"],
+        outputs=["llm_results"],
+        kind="io",
+        enabled=config.is_enabled("llm_analysis"),
+        defaults={"llm_results": ""},
+        skip_message="LLM analysis disabled, skipping...",
+        settings={
+            "llm_model": config.analysis["llm_model"],
+            "fallback_on_error": config.analysis["fallback_on_error"],
+        },
+        code=["main", "llm_analyzer"],
+    ))
+    pipeline.add(Stage(
+        "report", _report_stage,
+        inputs=[
+            "output_dir", "range_results", "llm_results", "input_file", "key_info",
+            "transcription", "features",
+        ],
+        outputs=["analysis_file", "data_files"],
+        kind="io",
+        settings={
+            "format": config.output["format"],
+            "table": config.output["table"],
+            "profile": config.analysis["profile"],
+            "pitch_backend": profile["pitch_backend"],
+            "model": model if vocal_extraction else None,
+        },
+        code=["main", "output_generator"],
+    ))
+    return pipeline
+
+
+def analyze_file(
+    input_file,
+    output_dir,
+    config,
+    session,
+    model,
+    extract_all,
+    quiet,
+    cache=None,
+    profiler=None,
+    catalog=None,
+    incremental=True,
+):
+    """Run the full analysis pipeline on one input file.
+
+    Args:
+        input_file: Path to input audio file (WAV or MP3)
+        output_dir: Directory for output files
+        config: Config instance
+        session: AnalysisSession holding decoded audio for this run
+        model: Separation model filename
+        extract_all: Extract all stems instead of just vocals
+        quiet: Minimize console output
+        cache: ResultCache for stage results (None to always recompute)
+        profiler: StageProfiler to measure the stages with; its report is
+            written to <name>_profile.json in output_dir (optional)
+        catalog: Catalog to record the finished analysis in (optional)
+        incremental: Reuse the results of stages unchanged since the last run
+            in output_dir (see manifest.py); cache.incremental must be on
+
+    Returns:
+        dict: Analysis results, including the path of the generated report,
+        the names of reused stages (and the stage profile when profiling)
+    """
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file does not exist: {input_file}")
+    if not input_file.lower().endswith(AUDIO_EXTENSIONS):
+        raise ValueError(f"Input file must be WAV or MP3: {input_file}")
+
+    output_formats(config)  # fail before any work on a bad output.format
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    run = SimpleNamespace(
+        config=config,
+        session=session,
+        model=model,
+        extract_all=extract_all,
+        quiet=quiet,
+        cache=cache,
+    )
+    pipeline = build_pipeline(config, session.scheduler, extract_all, model)
+    manifest = None
+    if config.cache["incremental"]:
+        from .manifest import RunManifest, manifest_path
+
+        manifest = RunManifest(manifest_path(input_file, output_dir), reuse=incremental)
+    if profiler is not None:
+        profiler.start()
+    try:
+        values = pipeline.run(
+            {"input_file": input_file, "output_dir": output_dir},
+            context=run,
+            quiet=quiet,
+            profiler=profiler,
+            manifest=manifest,
+        )
+    finally:
+        # Stems written in the background must be complete when the run returns
+        session.wait_for_writes()
+        if profiler is not None:
+            profiler.stop()
+    if manifest is not None:
+        manifest.refresh()
+
+    result = {
+        "input_file": input_file,
+        "output_dir": output_dir,
+        "analysis_file": values["analysis_file"],
+        "data_files": values["data_files"],
+        "vocal_file": values["vocal_file"],
+        "output_files": values["output_files"],
+        "transcription": values["transcription"],
+        "features": values["features"],
+        "key_info": values["key_info"],
+        "range_results": values["range_results"],
+        "plot_file": values["plot_file"],
+        "llm_results": values["llm_results"],
+        "reused_stages": manifest.reused if manifest is not None else [],
+    }
+    if profiler is not None:
+        from .profiler import profile_path
+
+        result["profile"] = profiler.report()
+        result["profile_file"] = profiler.write(
+            profile_path(input_file, output_dir),
+            input_file=input_file,
+            parallel_stages=session.scheduler is not None,
+        )
+    if catalog is not None:
+        from .cache import file_digest
+
+        try:
+            catalog.add(
+                result,
+                file_digest(input_file),
+                model=model if config.is_enabled("vocal_extraction") else None,
+                profile=config.analysis["profile"],
+            )
+        except Exception as e:
+            # The analysis itself succeeded; don't fail the run over the catalog
+            print(f"Warning: could not update catalog {catalog.path}: {e}")
+    return result
+
+
+def print_batch_summary(succeeded, failed):
+    """Print a per-file success/failure summary for a batch run.
+
+    Args:
+        succeeded: List of analysis result dicts
+        failed: List of (input_file, error message) tuples
+    """
+    print()
+    print(f"Batch summary: {len(succeeded)} succeeded, {len(failed)} failed")
+    print("=" * 60)
+    for result in succeeded:
+        print(f"  OK    {result['input_file']} -> {result['analysis_file']}")
+    for input_file, error in failed:
+        print(f"  FAIL  {input_file}: {error}")
 
 
 def main():
     """Main function to orchestrate vocal analysis."""
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from .server import serve_main
+
+        return serve_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        from .catalog import query_main
+
+        return query_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(description="Vocal Analyzer")
-    parser.add_argument("input_file", nargs="?", help="Input audio file (WAV or MP3)")
-    parser.add_argument("-o", "--output_dir", help="Output directory", default=None)
+    parser.add_argument(
+        "input_files",
+        nargs="*",
+        help="Input audio files (WAV or MP3), directories, glob patterns, or - to read paths from stdin",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        help="Output directory (in batch mode, each file gets a subdirectory here)",
+        default=None,
+    )
     parser.add_argument("-q", "--quiet", action="store_true", help="Run in quiet mode")
     parser.add_argument(
         "--config",
@@ -31,22 +1027,66 @@ def main():
         default=None,
         help="Model to use for separation (overrides config)",
     )
+    parser.add_argument(
+        "--quality",
+        choices=sorted(QUALITY_PROFILES),
+        default=None,
+        help="Analysis quality profile (overrides config; fast trades precision for speed)",
+    )
     parser.add_argument(
         "--list-models",
         action="store_true",
         help="List available models and their supported stems",
     )
+    parser.add_argument(
+        "--refresh-models",
+        action="store_true",
+        help="Rebuild the cached model list (with --list-models, list the rebuilt one)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Recompute every stage instead of reusing cached results",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record wall/CPU time and memory of every stage in <name>_profile.json",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="Also dump a cProfile .prof file per stage (implies --profile)",
+    )
+    parser.add_argument(
+        "--show-pipeline",
+        action="store_true",
+        help="Show the analysis stages and their dependencies for the current config",
+    )
     args = parser.parse_args()
 
     # Load configuration
     config = Config(config_path=args.config)
+    if args.quality:
+        config.analysis["profile"] = args.quality
+    # Every file of this invocation appends to the same results table
+    config.output["table"] = results_table_path(config, args.output_dir)
+
+    if args.refresh_models or args.list_models:
+        # vocal_extractor imports NumPy and soundfile; only load it when needed
+        from .vocal_extractor import configure_model_list, get_model_list
+
+        configure_model_list(config.cache["models_file"], config.cache["models_ttl_hours"])
+
+    if args.refresh_models and not args.list_models:
+        models = get_model_list(refresh=True)
+        print(f"Model list refreshed: {len(models)} models cached in {config.cache['models_file']}")
+        if not args.input_files:
+            return
 
     # Handle list models option
     if args.list_models:
-        from audio_separator.separator import Separator
-
-        sep = Separator(info_only=True)
-        models = sep.get_simplified_model_list()
+        models = get_model_list(refresh=args.refresh_models)
 
         print("Available models and their supported stems:")
         print("=" * 60)
@@ -73,140 +1113,133 @@ def main():
         print("Use --model <filename> to specify which model to use.")
         return
 
+    if args.show_pipeline:
+        extract_all = args.all_stems or config.extraction["extract_all_stems"]
+        print(build_pipeline(config, extract_all=extract_all).describe(initial=["input_file", "output_dir"]))
+        return
+
     # Check if input file is provided when needed
-    if not args.input_file:
+    if not args.input_files:
         print("Error: Input file is required when not using --list-models")
         parser.print_help()
         return
 
-    # Validate input file
-    print("starting")
-    if not os.path.exists(args.input_file):
-        print("Error: Input file does not exist")
-        return
-    if not args.input_file.lower().endswith((".wav", ".mp3")):
-        print("Error: Input file must be WAV or MP3")
+    input_files = collect_input_files(args.input_files)
+    if not input_files:
+        print("Error: No WAV or MP3 files found in the given inputs")
         return
+    batch = len(input_files) > 1
 
-    # Set output directory
-    if args.output_dir:
-        output_dir = args.output_dir
-    else:
-        # Create analysis subdirectory next to original file
-        input_dir = os.path.dirname(args.input_file)
-        input_basename = os.path.splitext(os.path.basename(args.input_file))[0]
-        output_dir = os.path.join(input_dir, f"{input_basename}-analysis")
+    from .vocal_extractor import configure_model_list, configure_separation
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    configure_model_list(config.cache["models_file"], config.cache["models_ttl_hours"])
+    configure_separation(config.extraction)
+
+    # Determine which model to use (CLI arg overrides config)
+    model = args.model if args.model else config.extraction["model"]
+    extract_all = args.all_stems or config.extraction["extract_all_stems"]
+    quiet = args.quiet or config.output["quiet_mode"]
+
+    from .openai_transport import configure as configure_openai
+    from .scheduler import StageScheduler
+
+    configure_openai(**config.api)
+
+    print("starting")
+    scheduler = None
+    if config.performance["parallel_stages"]:
+        scheduler = StageScheduler(max_workers=config.performance["max_workers"])
+    cache = None
+    pcm_cache = None
+    if config.cache["enabled"] and not args.no_cache:
+        cache = make_result_cache(config)
+        pcm_cache = make_pcm_cache(config)
+    catalog = None
+    if config.catalog["enabled"]:
+        from .catalog import Catalog
+
+        catalog = Catalog(config.catalog["path"])
+    session = AnalysisSession(
+        profile=config.quality_profile(), scheduler=scheduler, pcm_cache=pcm_cache
+    )
+    succeeded = []
+    failed = []
+    profiling = args.profile or args.cprofile
+    # Analysis subdirectories next to the original files (or under -o)
+    output_dirs = batch_output_dirs(input_files, args.output_dir)
 
     try:
-        # Determine which model to use (CLI arg overrides config)
-        model = args.model if args.model else config.extraction["model"]
-        extract_all = args.all_stems or config.extraction["extract_all_stems"]
-        quiet = args.quiet or config.output["quiet_mode"]
-
-        # Extract vocals/stems if enabled
-        if config.is_enabled("vocal_extraction"):
-            if extract_all:
-                # Extract all available stems
-                if not quiet:
-                    print(f"Extracting all stems using model: {model}")
-
-                    # Show what stems this model can produce
-                    model_info = get_model_stem_info(model)
-                    if model_info:
-                        stems_list = [
-                            stem.split("(")[0].strip().rstrip("*").strip()
-                            for stem in model_info["Stems"]
-                        ]
-                        print(f"This model can produce: {', '.join(stems_list)}")
-
-                stem_files = extract_all_stems(args.input_file, output_dir, model)
-
-                if not quiet:
-                    print("All stems extracted successfully:")
-                    for stem_name, file_path in stem_files.items():
-                        print(f"  {stem_name}: {os.path.basename(file_path)}")
-
-                # For analysis, we still need the vocals file specifically
-                vocal_file = stem_files.get("vocals") or stem_files.get("Vocals")
-                if not vocal_file:
-                    # If no vocals stem, try to find the best one for analysis
-                    if "vocal" in stem_files:
-                        vocal_file = stem_files["vocal"]
-                    else:
-                        # Use the first available stem as fallback
-                        vocal_file = next(iter(stem_files.values()))
-                        if not quiet:
-                            print(
-                                f"No vocals stem found, using {list(stem_files.keys())[0]} for analysis"
-                            )
-
-                output_files_list = list(stem_files.values())
+        for index, input_file in enumerate(input_files, start=1):
+            # Set output directory
+            if args.output_dir and not batch:
+                output_dir = args.output_dir
             else:
-                # Extract vocals only (original behavior)
-                vocal_file = extract_vocals(args.input_file, output_dir, model)
-                output_files_list = [vocal_file]
-        else:
-            # Skip extraction, assume vocal file already exists
-            if not quiet:
-                print("Vocal extraction disabled, looking for existing vocal file...")
-            vocal_file = args.input_file
-            output_files_list = []
-
-        # Transcribe vocals if enabled
-        transcription = ""
-        if config.is_enabled("transcription"):
-            transcription = transcribe_audio(vocal_file)
-        elif not quiet:
-            print("Transcription disabled, skipping...")
+                output_dir = output_dirs[index - 1]
 
-        # Extract features (always needed for range analysis)
-        features = extract_features(vocal_file)
+            if batch and not quiet:
+                print(f"[{index}/{len(input_files)}] {input_file}")
 
-        # Find musical key if enabled
-        key_info = None
-        if config.is_enabled("key_detection"):
-            key_info = find_key(args.input_file)
-        elif not quiet:
-            print("Key detection disabled, skipping...")
+            profiler = None
+            if profiling:
+                from .profiler import StageProfiler
 
-        # Initialize and run range analyzer if enabled
-        range_results = {}
-        if config.is_enabled("range_analysis"):
-            range_analyzer = RangeAnalyzer(vocal_file, output_dir)
-            range_results = range_analyzer.analyze()
-        elif not quiet:
-            print("Range analysis disabled, skipping...")
+                base_name = os.path.splitext(os.path.basename(input_file))[0]
+                cprofile_dir = os.path.join(output_dir, f"{base_name}_cprofile") if args.cprofile else None
+                profiler = StageProfiler(cprofile_dir=cprofile_dir)
 
-        # Run LLM analysis if enabled
-        llm_results = ""
-        if config.is_enabled("llm_analysis"):
-            llm_analyzer = LLMAnalyzer(transcription, features)
-            llm_results = llm_analyzer.analyze()
-        elif not quiet:
-            print("LLM analysis disabled, skipping...")
+            try:
+                result = analyze_file(
+                    input_file, output_dir, config, session, model, extract_all, quiet, cache,
+                    profiler, catalog, incremental=not args.no_cache,
+                )
+            except Exception as e:
+                print(f"Error during analysis: {str(e)}")
+                failed.append((input_file, str(e)))
+                continue
+            finally:
+                # Release decoded audio before moving on to the next file
+                session.clear()
 
-        # Generate output
-        analysis_file = generate_output(
-            output_dir, range_results, llm_results, args.input_file, key_info, transcription
-        )
+            succeeded.append(result)
 
-        # Print summary
-        if not args.quiet:
-            if args.all_stems:
-                print(
-                    f"Analysis complete. Stem files: {', '.join([os.path.basename(f) for f in output_files_list])}"
-                )
-                print(f"Analysis file: {os.path.basename(analysis_file)}")
-            else:
-                print(
-                    f"Analysis complete. Output files: {os.path.basename(vocal_file)}, {os.path.basename(analysis_file)}"
-                )
+            # Print summary
+            if not args.quiet:
+                if args.all_stems:
+                    print(
+                        f"Analysis complete. Stem files: {', '.join([os.path.basename(f) for f in result['output_files']])}"
+                    )
+                    print(f"Analysis file: {os.path.basename(result['analysis_file'])}")
+                else:
+                    print(
+                        f"Analysis complete. Output files: {os.path.basename(result['vocal_file'])}, {os.path.basename(result['analysis_file'])}"
+                    )
+                if result["data_files"]:
+                    print(f"Data files: {', '.join(result['data_files'])}")
+    finally:
+        session.clear()
+        if scheduler is not None:
+            scheduler.shutdown()
+        if "parquet" in config.output["format"]:
+            # Rows of the whole run go into one Parquet file
+            from .output_generator import flush_parquet
 
-    except Exception as e:
-        print(f"Error during analysis: {str(e)}")
+            flush_parquet()
+
+    if batch:
+        print_batch_summary(succeeded, failed)
+    if profiling and succeeded:
+        from .profiler import print_summary, summarize
+
+        if batch:
+            summary = summarize([result["profile"] for result in succeeded])
+            print_summary(summary, len(succeeded))
+            if args.output_dir:
+                summary_file = os.path.join(args.output_dir, "profile_summary.json")
+                with open(summary_file, "w") as f:
+                    json.dump({"files": len(succeeded), "stages": summary}, f, indent=2)
+                print(f"Stage profile summary: {summary_file}")
+        elif not quiet:
+            print(f"Stage profile: {os.path.basename(succeeded[0]['profile_file'])}")
 
 
 if __name__ == "__main__":
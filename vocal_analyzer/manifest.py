@@ -0,0 +1,185 @@
+"""Per-stage fingerprints of an analysis run, for incremental re-runs.
+
+Every run writes <name>_manifest.json to its output directory, recording
+for each stage a fingerprint and the outputs it produced. A stage's
+fingerprint hashes:
+
+    - the fingerprints of its inputs (the input file's path and content
+      for the file itself, the producing stage's fingerprint for values
+      made by another stage), so a change propagates downstream
+    - the digest of the source files of the modules doing its work
+    - the config settings it depends on
+
+On the next run in the same output directory, a stage whose fingerprint
+is unchanged and whose files there are untouched is not run at all; its
+recorded outputs are used instead. Changing only analysis.llm_model thus
+re-runs the LLM analysis and the report, and nothing else.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from .cache import file_digest, json_default
+
+# Bump to invalidate every manifest after a change in how stages are fingerprinted
+MANIFEST_VERSION = 2
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def fingerprint(*parts):
+    """SHA-256 of JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=json_default)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def code_digest(modules):
+    """Fingerprint of the source of vocal_analyzer modules (e.g. "key_finder")."""
+    return fingerprint(
+        [(module, file_digest(os.path.join(PACKAGE_DIR, f"{module}.py"))) for module in sorted(modules)]
+    )
+
+
+def manifest_path(input_file, output_dir):
+    """Path of the manifest next to <name>_analysis.md."""
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(output_dir, f"{base_name}_manifest.json")
+
+
+def _absolute_paths(value):
+    """value with the strings naming existing files made absolute."""
+    if isinstance(value, str):
+        return os.path.abspath(value) if os.path.isfile(value) else value
+    if isinstance(value, dict):
+        return {key: _absolute_paths(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_absolute_paths(item) for item in value]
+    return value
+
+
+def _file_paths(value):
+    """Strings in a (nested) output value that name existing files."""
+    if isinstance(value, str):
+        return [value] if os.path.isfile(value) else []
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [path for item in value for path in _file_paths(item)]
+    return []
+
+
+class RunManifest:
+    """Stage fingerprints and outputs of the runs in one output directory.
+
+    Arguments:
+        path: manifest file (see manifest_path)
+        reuse: use recorded outputs of unchanged stages; when False every
+            stage runs, but the manifest is still rewritten for the next run
+    """
+
+    def __init__(self, path, reuse=True):
+        self.path = path
+        self.reuse = reuse
+        self.stages = {}
+        self.reused = []
+        self.recorded = []
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.stages = data["stages"]
+        except (OSError, ValueError, KeyError):
+            # Missing or unreadable manifest: every stage runs
+            pass
+
+    def value_fingerprint(self, value):
+        """Fingerprint of a value supplied to the pipeline rather than by a stage."""
+        if isinstance(value, str) and os.path.isfile(value):
+            return fingerprint(os.path.abspath(value), file_digest(value))
+        if isinstance(value, str) and os.path.isdir(value):
+            return fingerprint(os.path.abspath(value))
+        return fingerprint(value)
+
+    def stage_fingerprint(self, stage, input_fingerprints):
+        """Fingerprint of a stage from its inputs, code and settings.
+
+        Args:
+            stage: pipeline Stage
+            input_fingerprints: dict of input name -> fingerprint
+        """
+        return fingerprint(
+            MANIFEST_VERSION,
+            stage.name,
+            stage.enabled,
+            input_fingerprints,
+            code_digest(stage.code),
+            stage.settings,
+        )
+
+    def lookup(self, name, stage_fingerprint):
+        """Recorded outputs of an unchanged stage, or None if it must run.
+
+        A stage is unchanged when its fingerprint matches and every file
+        it produced in the output directory still has the recorded size
+        and modification time.
+        """
+        if not self.reuse:
+            return None
+        entry = self.stages.get(name)
+        if entry is None or entry["fingerprint"] != stage_fingerprint:
+            return None
+        for path, (size, mtime_ns) in entry["files"].items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                return None
+        self.reused.append(name)
+        return entry["outputs"]
+
+    def _files(self, outputs):
+        """Size and modification time of the files in outputs that are in the output directory."""
+        output_dir = os.path.dirname(os.path.abspath(self.path))
+        files = {}
+        for path in _file_paths(outputs):
+            # Files outside the output directory (the input, a shared
+            # results table) are not this run's to track
+            path = os.path.abspath(path)
+            if path.startswith(output_dir + os.sep):
+                stat = os.stat(path)
+                files[path] = [stat.st_size, stat.st_mtime_ns]
+        return files
+
+    def record(self, name, stage_fingerprint, outputs):
+        """Record the outputs of a stage that ran and rewrite the manifest.
+
+        Paths of files in the outputs are stored absolute, so a re-run from
+        another working directory finds them.
+        """
+        outputs = _absolute_paths(outputs)
+        # Keep plain JSON values (NumPy results become lists and floats)
+        self.stages[name] = json.loads(json.dumps(
+            {"fingerprint": stage_fingerprint, "files": self._files(outputs), "outputs": outputs},
+            default=json_default,
+        ))
+        self.recorded.append(name)
+        self.save()
+
+    def refresh(self):
+        """Re-record the files of the stages that ran, once files written in
+        the background (stems) are complete."""
+        if not self.recorded:
+            return
+        for name in self.recorded:
+            entry = self.stages[name]
+            entry["files"] = self._files(entry["outputs"])
+        self.save()
+
+    def save(self):
+        """Write the manifest atomically."""
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "stages": self.stages}, f, indent=2)
+        os.replace(tmp, self.path)
@@ -0,0 +1,136 @@
+"""Shared asyncio transport for OpenAI API calls.
+
+Transcription and LLM analysis both go through one AsyncOpenAI client per
+process. Its connection pool keeps TLS connections alive between requests,
+so batch runs and the server don't pay a new handshake for every song. The
+client runs on a background event loop; synchronous callers submit
+coroutines to it, and a semaphore caps how many requests are in flight.
+"""
+import asyncio
+import os
+import threading
+
+
+class OpenAITransport:
+    """Process-wide pooled AsyncOpenAI client on a background event loop.
+
+    Arguments:
+        max_in_flight: maximum concurrent API requests
+        timeout: per-request timeout in seconds
+        max_retries: retries for failed requests (handled by the client)
+    """
+
+    def __init__(self, max_in_flight=8, timeout=600, max_retries=2):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Start the background event loop thread on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="openai-transport", daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    @property
+    def client(self):
+        """The shared AsyncOpenAI client (created on first use)."""
+        if self._client is None:
+            # Imported here: the openai package is slow to import and only
+            # needed once a request is actually made
+            from openai import AsyncOpenAI
+
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY environment variable not set")
+            self._client = AsyncOpenAI(
+                api_key=api_key, timeout=self.timeout, max_retries=self.max_retries
+            )
+        return self._client
+
+    async def request(self, call):
+        """Run call(client) once an in-flight slot is free.
+
+        Args:
+            call: async callable taking the AsyncOpenAI client
+
+        Returns:
+            The awaited result of call
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            return await call(self.client)
+
+    def submit(self, coro):
+        """Schedule a coroutine on the transport loop from any thread.
+
+        Returns:
+            concurrent.futures.Future: the pending result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro):
+        """Run a coroutine on the transport loop and wait for its result."""
+        return self.submit(coro).result()
+
+    def close(self, timeout=10):
+        """Close the client's connections and stop the loop thread."""
+        with self._lock:
+            loop, thread, client = self._loop, self._thread, self._client
+            self._loop = self._thread = self._client = None
+            self._semaphore = None
+        if loop is None:
+            return
+        if client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout)
+            except Exception as e:
+                print(f"Warning: could not close OpenAI client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+
+_transport = None
+_transport_pid = None
+_transport_lock = threading.Lock()
+_settings = {}
+
+
+def configure(**settings):
+    """Set OpenAITransport options (e.g. from the [api] config section).
+
+    Takes effect for the transport created by the next get_transport() call;
+    the current one is closed.
+    """
+    global _transport
+    with _transport_lock:
+        _settings.clear()
+        _settings.update(settings)
+        # A forked child's transport belongs to the parent's loop thread
+        old = _transport if _transport_pid == os.getpid() else None
+        _transport = None
+    if old is not None:
+        old.close()
+
+
+def get_transport():
+    """Return this process's shared OpenAITransport."""
+    global _transport, _transport_pid
+    with _transport_lock:
+        # A forked child must not reuse the parent's loop thread or connections
+        if _transport is None or _transport_pid != os.getpid():
+            _transport = OpenAITransport(**_settings)
+            _transport_pid = os.getpid()
+        return _transport
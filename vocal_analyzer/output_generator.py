@@ -1,4 +1,18 @@
+import csv
+import hashlib
+import io
+import json
 import os
+import threading
+from datetime import datetime, timezone
+
+from .cache import json_default
+
+
+def format_time(seconds):
+    """Format seconds as m:ss."""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d}"
 
 
 def generate_output(output_dir, range_results, llm_results, input_file, key_info, transcription=""):
@@ -41,6 +55,31 @@ def generate_output(output_dir, range_results, llm_results, input_file, key_info
             if key_info['alt_key'] is not None:
                 f.write(f"**Also possible:** {key_info['alt_key']} (correlation: {key_info['alt_correlation']:.3f})\n\n")
             f.write("*Key detected using the Krumhansl-Schmuckler key-finding algorithm*\n\n")
+            if key_info.get('source'):
+                f.write(f"**Source:** {key_info['source']}\n\n")
+
+            timeline = key_info.get('timeline')
+            if timeline and timeline['sections']:
+                f.write("### Key Timeline\n\n")
+                f.write("| Section | Key | Correlation |\n")
+                f.write("|---------|-----|-------------|\n")
+                for section in timeline['sections']:
+                    f.write(
+                        f"| {format_time(section['start'])}-{format_time(section['end'])} "
+                        f"| {section['key']} | {section['correlation']:.3f} |\n"
+                    )
+                f.write("\n")
+                if timeline['modulations']:
+                    changes = ", ".join(
+                        f"{m['from']} to {m['to']} at {format_time(m['time'])}"
+                        for m in timeline['modulations']
+                    )
+                    f.write(f"**Modulations:** {changes}\n\n")
+                else:
+                    f.write("No modulations detected.\n\n")
+                f.write(
+                    f"*Keys of {timeline['window']:g} s windows every {timeline['step']:g} s*\n\n"
+                )
 
         # Write transcription section if transcription was performed
         if transcription:
@@ -62,7 +101,7 @@ def generate_output(output_dir, range_results, llm_results, input_file, key_info
                     f"({min_pitch:.2f} Hz to {max_pitch:.2f} Hz).\n\n"
                 )
                 if total_samples > 0:
-                    f.write(f"Analysis based on **{total_samples:,}** pitch samples.\n\n")
+                    f.write(f"Analysis based on **{total_samples:,}** voiced frames.\n\n")
             else:
                 f.write("No vocal range detected in the audio file.\n\n")
 
@@ -72,3 +111,196 @@ def generate_output(output_dir, range_results, llm_results, input_file, key_info
                 f.write(f"![Pitch Distribution]({plot_filename})\n\n")
 
     return analysis_file
+
+
+# Columns of the results table (CSV/Parquet), one row per analyzed file.
+# New columns are only ever appended, so existing tables stay readable.
+TABLE_COLUMNS = [
+    "input_file",
+    "analyzed_at",
+    "profile",
+    "pitch_backend",
+    "model",
+    "key",
+    "key_correlation",
+    "alt_key",
+    "alt_key_correlation",
+    "key_source",
+    "key_sections",
+    "modulations",
+    "min_pitch",
+    "max_pitch",
+    "min_note",
+    "max_note",
+    "voiced_frames",
+    "mean_pitch",
+    "mean_note",
+    "tempo",
+    "screaming",
+    "transcription",
+    "llm_analysis",
+    "analysis_file",
+    "plot_file",
+]
+
+# Serializes appends to a results table from concurrent analyses
+_table_lock = threading.Lock()
+# Parquet dataset directory -> rows waiting for flush_parquet
+_parquet_rows = {}
+
+
+def results_document(input_file, range_results, features, key_info, transcription, llm_results, **metadata):
+    """Collect every analysis result of one file in a JSON-serializable dict.
+
+    Args:
+        input_file: Path to input audio file
+        range_results: Dictionary with range analysis results (or None)
+        features: Dictionary from extract_features (or None)
+        key_info: Dictionary with key detection results (or None)
+        transcription: Transcription text (or empty string)
+        llm_results: LLM analysis text (or empty string)
+        **metadata: run settings to record (profile, pitch_backend, model, ...)
+
+    Returns:
+        dict: the per-run results document
+    """
+    return {
+        "input_file": input_file,
+        "analyzed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **metadata,
+        "key": key_info or None,
+        "range": range_results or None,
+        "features": features or None,
+        "transcription": transcription or "",
+        "llm_analysis": llm_results or "",
+    }
+
+
+def results_row(document):
+    """Flatten a results document into one TABLE_COLUMNS row (dict).
+
+    The key timeline is stored as a JSON string of its sections.
+    """
+    key_info = document["key"] or {}
+    range_results = document["range"] or {}
+    features = document["features"] or {}
+    timeline = key_info.get("timeline") or {}
+    row = {
+        "input_file": document["input_file"],
+        "analyzed_at": document["analyzed_at"],
+        "profile": document.get("profile"),
+        "pitch_backend": document.get("pitch_backend"),
+        "model": document.get("model"),
+        "key": key_info.get("key"),
+        "key_correlation": key_info.get("correlation"),
+        "alt_key": key_info.get("alt_key"),
+        "alt_key_correlation": key_info.get("alt_correlation"),
+        "key_source": key_info.get("source"),
+        "key_sections": json.dumps(timeline["sections"]) if timeline else None,
+        "modulations": len(timeline["modulations"]) if timeline else None,
+        "min_pitch": range_results.get("min_pitch", features.get("min_pitch")),
+        "max_pitch": range_results.get("max_pitch", features.get("max_pitch")),
+        "min_note": range_results.get("min_note", features.get("min_note")),
+        "max_note": range_results.get("max_note", features.get("max_note")),
+        "voiced_frames": range_results.get("total_samples"),
+        "mean_pitch": features.get("mean_pitch"),
+        "mean_note": features.get("mean_note"),
+        "tempo": features.get("tempo"),
+        "screaming": features.get("screaming"),
+        "transcription": document["transcription"],
+        "llm_analysis": document["llm_analysis"],
+        "analysis_file": document.get("analysis_file"),
+        "plot_file": range_results.get("plot_file"),
+    }
+    # Plain Python scalars, so every writer sees the same types
+    return {
+        column: value.item() if hasattr(value, "item") else value
+        for column, value in row.items()
+    }
+
+
+def generate_json(output_dir, document):
+    """Write the results document to <name>_analysis.json."""
+    base_name = os.path.splitext(os.path.basename(document["input_file"]))[0]
+    json_file = os.path.join(output_dir, f"{base_name}_analysis.json")
+    with open(json_file, "w") as f:
+        json.dump(document, f, indent=2, default=json_default)
+    return json_file
+
+
+def append_csv(table_file, row):
+    """Append one row to a CSV results table, writing the header for a new table."""
+    directory = os.path.dirname(table_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=TABLE_COLUMNS)
+    with _table_lock:
+        if not os.path.exists(table_file) or os.path.getsize(table_file) == 0:
+            writer.writeheader()
+        writer.writerow(row)
+        # One write per row, so appends from other processes don't interleave
+        with open(table_file, "a", newline="") as f:
+            f.write(buffer.getvalue())
+    return table_file
+
+
+def append_parquet(table_dir, row):
+    """Queue one row for a Parquet dataset directory.
+
+    Rows are held until flush_parquet, which writes the rows of a whole run
+    as one file, rather than one tiny file per analysis. The directory can
+    be read as a single table, e.g. with pandas.read_parquet(table_dir) or
+    pyarrow.dataset.dataset(table_dir). Requires pyarrow
+    (pip install vocal-analyzer[parquet]), which main.output_formats checks
+    before any analysis starts.
+
+    Returns:
+        str: table_dir
+    """
+    with _table_lock:
+        _parquet_rows.setdefault(table_dir, []).append(row)
+    return table_dir
+
+
+def flush_parquet():
+    """Write the queued rows of every Parquet dataset, one file per dataset.
+
+    Returns:
+        list: Paths of the written files
+    """
+    with _table_lock:
+        pending = dict(_parquet_rows)
+        _parquet_rows.clear()
+    if not pending:
+        return []
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    paths = []
+    for table_dir, rows in pending.items():
+        os.makedirs(table_dir, exist_ok=True)
+        table = pa.Table.from_pylist(rows, schema=_parquet_schema(pa))
+        names = "\0".join(f"{row['input_file']}\0{row['analyzed_at']}" for row in rows)
+        digest = hashlib.sha256(names.encode()).hexdigest()[:16]
+        path = os.path.join(table_dir, f"{rows[0]['analyzed_at'][:10]}-{digest}.parquet")
+        pq.write_table(table, path)
+        paths.append(path)
+    return paths
+
+
+def _parquet_schema(pa):
+    """Fixed Parquet schema, so files of runs with missing results still concatenate."""
+    types = {
+        "key_correlation": pa.float64(),
+        "alt_key_correlation": pa.float64(),
+        "modulations": pa.int64(),
+        "min_pitch": pa.float64(),
+        "max_pitch": pa.float64(),
+        "voiced_frames": pa.int64(),
+        "mean_pitch": pa.float64(),
+        "tempo": pa.float64(),
+        "screaming": pa.bool_(),
+    }
+    return pa.schema([(column, types.get(column, pa.string())) for column in TABLE_COLUMNS])
@@ -0,0 +1,225 @@
+"""Dependency-aware analysis pipeline.
+
+The analysis flow is modelled as a DAG of stages, each declaring the named
+values it consumes and produces. The executor starts every stage as soon as
+its inputs exist, so network-bound stages (transcription, LLM) overlap with
+CPU-bound ones. Adding a stage means declaring it, not editing the control
+flow.
+
+With a RunManifest (see manifest.py), stages whose inputs, code and settings
+are unchanged since the last run in the same output directory are not run;
+their recorded outputs are used instead.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Stage:
+    """A pipeline step with declared inputs and outputs.
+
+    Arguments:
+        name: unique stage name
+        func: callable(context, **inputs) returning a dict of outputs
+        inputs: names of the values the stage needs
+        outputs: names of the values the stage produces
+        kind: "cpu" for CPU-bound work, "io" for network/disk-bound work
+        enabled: when False the stage is skipped and its outputs take defaults
+        defaults: output values used when the stage is disabled (None if absent)
+        skip_message: printed (unless quiet) when the stage is disabled
+        settings: JSON-serializable config values the stage's result depends on
+        code: names of the vocal_analyzer modules doing the stage's work,
+            including the one defining func
+    """
+
+    def __init__(
+        self,
+        name,
+        func,
+        inputs=(),
+        outputs=(),
+        kind="cpu",
+        enabled=True,
+        defaults=None,
+        skip_message=None,
+        settings=None,
+        code=(),
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.kind = kind
+        self.enabled = enabled
+        self.defaults = defaults or {}
+        self.skip_message = skip_message
+        self.settings = settings or {}
+        self.code = tuple(code)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs}, kind={self.kind!r})"
+
+
+class Pipeline:
+    """A DAG of stages and an executor that runs them concurrently.
+
+    Arguments:
+        cpu_slots: how many CPU-bound stages may run at once (io stages are
+            never limited); use 1 when CPU stages run in this process
+    """
+
+    def __init__(self, cpu_slots=1):
+        self.stages = []
+        self.cpu_slots = cpu_slots
+
+    def add(self, stage):
+        """Add a stage; its outputs must not clash with an existing stage's."""
+        produced = self.producers()
+        for output in stage.outputs:
+            if output in produced:
+                raise ValueError(
+                    f"Stage {stage.name!r} output {output!r} is already produced by {produced[output].name!r}"
+                )
+        self.stages.append(stage)
+        return stage
+
+    def producers(self):
+        """Map each value name to the stage producing it."""
+        return {output: stage for stage in self.stages for output in stage.outputs}
+
+    def dependencies(self):
+        """Map each stage name to the names of the stages it depends on."""
+        produced = self.producers()
+        return {
+            stage.name: sorted({produced[i].name for i in stage.inputs if i in produced})
+            for stage in self.stages
+        }
+
+    def order(self, initial=()):
+        """Return stage names in a valid execution order.
+
+        Args:
+            initial: names of values supplied to run() rather than by a stage
+
+        Raises:
+            ValueError: if an input is never produced or the graph has a cycle
+        """
+        available = set(initial)
+        remaining = list(self.stages)
+        ordered = []
+        while remaining:
+            ready = [s for s in remaining if all(i in available for i in s.inputs)]
+            if not ready:
+                missing = {i for s in remaining for i in s.inputs if i not in available}
+                raise ValueError(
+                    f"Stages {[s.name for s in remaining]} cannot run; unresolved inputs: {sorted(missing)}"
+                )
+            for stage in ready:
+                remaining.remove(stage)
+                ordered.append(stage.name)
+                available.update(stage.outputs)
+        return ordered
+
+    def describe(self, initial=()):
+        """Human-readable description of the dependency graph."""
+        deps = self.dependencies()
+        by_name = {stage.name: stage for stage in self.stages}
+        lines = []
+        for name in self.order(initial):
+            stage = by_name[name]
+            state = "" if stage.enabled else " (disabled)"
+            lines.append(f"{name} [{stage.kind}]{state}")
+            lines.append(f"  inputs:  {', '.join(stage.inputs) or '-'}")
+            lines.append(f"  outputs: {', '.join(stage.outputs) or '-'}")
+            lines.append(f"  after:   {', '.join(deps[name]) or '-'}")
+        return "\n".join(lines)
+
+    def run(self, initial, context=None, quiet=False, profiler=None, manifest=None):
+        """Execute the pipeline.
+
+        Args:
+            initial: dict of values available before any stage runs
+            context: object passed as the first argument to every stage function
+            quiet: suppress skip messages of disabled stages
+            profiler: StageProfiler measuring every stage that runs (optional);
+                stages then run one at a time, so their measurements don't
+                include each other's work
+            manifest: RunManifest to reuse unchanged stages from and record
+                the others in (optional)
+
+        Returns:
+            dict: all initial and produced values
+        """
+        self.order(initial)  # validate before starting anything
+        values = dict(initial)
+        pending = list(self.stages)
+        running = {}
+        cpu_slots = threading.Semaphore(self.cpu_slots)
+        # Profilers (cProfile, tracemalloc peaks) are process-wide
+        profiled = threading.Lock()
+        fingerprints = {}
+        stage_fingerprints = {}
+        if manifest is not None:
+            fingerprints = {name: manifest.value_fingerprint(value) for name, value in values.items()}
+
+        def call(stage, inputs):
+            if profiler is None:
+                return stage.func(context, **inputs)
+            with profiled, profiler.stage(stage.name):
+                return stage.func(context, **inputs)
+
+        def execute(stage, inputs):
+            if stage.kind == "cpu":
+                with cpu_slots:
+                    return call(stage, inputs)
+            return call(stage, inputs)
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.stages))) as pool:
+            try:
+                while pending or running:
+                    ready = [s for s in pending if all(i in values for i in s.inputs)]
+                    for stage in ready:
+                        pending.remove(stage)
+                        if manifest is not None:
+                            fingerprint = manifest.stage_fingerprint(
+                                stage, {name: fingerprints[name] for name in stage.inputs}
+                            )
+                            stage_fingerprints[stage.name] = fingerprint
+                            fingerprints.update({name: fingerprint for name in stage.outputs})
+                        if not stage.enabled:
+                            if stage.skip_message and not quiet:
+                                print(stage.skip_message)
+                            values.update({name: stage.defaults.get(name) for name in stage.outputs})
+                            continue
+                        if manifest is not None:
+                            outputs = manifest.lookup(stage.name, stage_fingerprints[stage.name])
+                            if outputs is not None:
+                                if not quiet:
+                                    print(f"{stage.name}: unchanged since last run, reusing its results")
+                                values.update(outputs)
+                                continue
+                        inputs = {name: values[name] for name in stage.inputs}
+                        running[pool.submit(execute, stage, inputs)] = stage
+
+                    if not running:
+                        # Only disabled or reused stages were ready; their outputs may unblock more
+                        continue
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage = running.pop(future)
+                        outputs = future.result()
+                        missing = set(stage.outputs) - set(outputs)
+                        if missing:
+                            raise RuntimeError(
+                                f"Stage {stage.name!r} did not produce {sorted(missing)}"
+                            )
+                        values.update(outputs)
+                        if manifest is not None:
+                            manifest.record(stage.name, stage_fingerprints[stage.name], outputs)
+            except BaseException:
+                # Don't start anything new; running stages finish on pool exit
+                pending.clear()
+                for future in running:
+                    future.cancel()
+                raise
+        return values
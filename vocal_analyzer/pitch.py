@@ -0,0 +1,220 @@
+"""Pitch estimation backends and the compact per-frame pitch track.
+
+Every backend (analysis.pitch_backend) reduces a signal to a PitchTrack:
+one float32 f0 and one float32 confidence per STFT frame. Range analysis,
+histograms and pitch features all work on it, so no full (bins x frames)
+pitch or magnitude matrix outlives the estimation.
+
+    piptrack  dominant librosa.piptrack peak of each frame
+    yin       vectorized YIN (far faster than pyin)
+    pyin      librosa.pyin (most accurate, slowest)
+
+Estimation is frame-local and frames are laid out like
+librosa.stft(center=True), so a track can be computed for a whole signal
+or for consecutive blocks of it (pyin's decoding excepted).
+"""
+import librosa
+import numpy as np
+import scipy.fft
+
+PITCH_BACKENDS = ("piptrack", "yin", "pyin")
+
+# Vocal range searched by the f0 estimators
+FMIN = 65.0  # C2
+FMAX = 2093.0  # C7
+
+# Frames whose pitch confidence is below this count as unvoiced (for
+# piptrack, a frame whose strongest peak is under a tenth of its peak
+# magnitude is noise or a breath, not a sung note)
+VOICED_CONFIDENCE = 0.1
+
+
+def check_backend(name):
+    """Raise ValueError for an unknown pitch backend name."""
+    if name not in PITCH_BACKENDS:
+        raise ValueError(
+            f"Unknown pitch backend {name!r} (choose from {', '.join(PITCH_BACKENDS)})"
+        )
+
+
+def yin_frames(frames, sr, fmin=FMIN, fmax=FMAX, threshold=0.15):
+    """Estimate one f0 per frame with YIN, vectorized over all frames.
+
+    The difference function of every frame is computed at once from an
+    FFT cross-correlation and running energy sums, so there is no Python
+    loop over frames or lags.
+
+    Args:
+        frames: (frame_length, n_frames) array of signal frames
+        sr: sample rate
+        fmin: lowest f0 searched
+        fmax: highest f0 searched
+        threshold: cumulative mean normalized difference below which a
+            frame is considered voiced
+
+    Returns:
+        tuple: (f0, confidence) per frame; f0 is 0 for unvoiced frames and
+        confidence is 1 minus the normalized difference at the chosen period
+    """
+    frame_length, n_frames = frames.shape
+    min_period = max(1, int(np.floor(sr / fmax)))
+    max_period = min(frame_length // 2, int(np.ceil(sr / fmin)))
+    window = frame_length - max_period
+    if n_frames == 0 or max_period <= min_period + 1:
+        return np.zeros(n_frames, dtype=np.float32), np.zeros(n_frames, dtype=np.float32)
+
+    x = np.ascontiguousarray(frames.T, dtype=np.float32)
+    n_fft = scipy.fft.next_fast_len(frame_length + window, real=True)
+    # r[tau] = sum_j x[j] x[j + tau] over the integration window
+    corr = scipy.fft.irfft(
+        np.conj(scipy.fft.rfft(x[:, :window], n_fft, workers=-1))
+        * scipy.fft.rfft(x, n_fft, workers=-1),
+        n_fft,
+        workers=-1,
+    )[:, : max_period + 1]
+    energy = np.concatenate(
+        [np.zeros((n_frames, 1)), np.cumsum(x**2, axis=1, dtype=np.float64)], axis=1
+    )
+    lags = np.arange(max_period + 1)
+    shifted_energy = energy[:, lags + window] - energy[:, lags]
+    diff = np.maximum(energy[:, [window]] + shifted_energy - 2 * corr, 0.0)
+
+    # Cumulative mean normalized difference d'(tau), tau >= 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cmnd = diff[:, 1:] * lags[1:] / np.cumsum(diff[:, 1:], axis=1)
+    cmnd = np.nan_to_num(cmnd, nan=1.0, posinf=1.0)
+
+    # First local minimum below the threshold within the searched periods
+    search = cmnd[:, min_period - 1 : max_period]
+    is_minimum = np.zeros_like(search, dtype=bool)
+    is_minimum[:, 1:-1] = (search[:, 1:-1] < search[:, :-2]) & (search[:, 1:-1] <= search[:, 2:])
+    candidates = is_minimum & (search < threshold)
+    voiced = candidates.any(axis=1)
+    index = np.argmax(candidates, axis=1)
+
+    # Parabolic interpolation around the minimum
+    rows = np.arange(n_frames)
+    inner = np.clip(index, 1, search.shape[1] - 2)
+    left, center, right = search[rows, inner - 1], search[rows, inner], search[rows, inner + 1]
+    denominator = left - 2 * center + right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.where(np.abs(denominator) > 1e-12, 0.5 * (left - right) / denominator, 0.0)
+    period = min_period + inner + np.clip(shift, -1, 1)
+
+    f0 = np.where(voiced, sr / period, 0.0).astype(np.float32)
+    confidence = np.where(voiced, np.clip(1.0 - center, 0.0, 1.0), 0.0).astype(np.float32)
+    return f0, confidence
+
+
+class PitchTrack:
+    """Compact pitch representation: dominant f0 and its confidence per frame.
+
+    Arguments:
+        f0: float32 f0 in Hz per frame (0 where no pitch was found)
+        confidence: float32 confidence in [0, 1] per frame
+    """
+
+    def __init__(self, f0, confidence):
+        self.f0 = np.asarray(f0, dtype=np.float32)
+        self.confidence = np.asarray(confidence, dtype=np.float32)
+
+    @classmethod
+    def concatenate(cls, tracks):
+        """Join the tracks of consecutive blocks."""
+        tracks = list(tracks)
+        return cls(
+            np.concatenate([t.f0 for t in tracks]) if tracks else np.zeros(0),
+            np.concatenate([t.confidence for t in tracks]) if tracks else np.zeros(0),
+        )
+
+    def __len__(self):
+        return len(self.f0)
+
+    @property
+    def voiced(self):
+        """Boolean mask of frames with a pitch of at least VOICED_CONFIDENCE."""
+        return (self.f0 > 0) & (self.confidence >= VOICED_CONFIDENCE)
+
+    @property
+    def pitches(self):
+        """f0 of the voiced frames (Hz)."""
+        return self.f0[self.voiced]
+
+    @property
+    def nbytes(self):
+        return self.f0.nbytes + self.confidence.nbytes
+
+
+def piptrack_track(magnitude, sr, n_fft=2048, hop_length=512, block_frames=1024):
+    """PitchTrack of the strongest piptrack peak in every frame.
+
+    Confidence is the peak's share of the frame's total peak magnitude.
+    Peaks are searched between FMIN and FMAX like the f0 estimators.
+    piptrack runs on blocks of frames so its full-size pitch and magnitude
+    matrices only ever exist for one block.
+    """
+    f0 = np.zeros(magnitude.shape[1], dtype=np.float32)
+    confidence = np.zeros(magnitude.shape[1], dtype=np.float32)
+    for start in range(0, magnitude.shape[1], block_frames):
+        block = slice(start, start + block_frames)
+        pitches, magnitudes = librosa.piptrack(
+            S=magnitude[:, block], sr=sr, n_fft=n_fft, hop_length=hop_length, fmin=FMIN, fmax=FMAX
+        )
+        peak = np.argmax(magnitudes, axis=0)
+        frames = np.arange(magnitudes.shape[1])
+        strongest = magnitudes[peak, frames]
+        total = magnitudes.sum(axis=0)
+        f0[block] = pitches[peak, frames]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            confidence[block] = np.where(total > 0, strongest / total, 0.0)
+    return PitchTrack(f0, confidence)
+
+
+def yin_track(y, sr, frame_length=2048, hop_length=512, fmin=FMIN, fmax=FMAX, center=True):
+    """PitchTrack of a signal from yin_frames."""
+    if center:
+        y = np.pad(y, frame_length // 2)
+    if len(y) < frame_length:
+        return PitchTrack(np.zeros(0), np.zeros(0))
+    frames = librosa.util.frame(y, frame_length=frame_length, hop_length=hop_length)
+    return PitchTrack(*yin_frames(frames, sr, fmin=fmin, fmax=fmax))
+
+
+def pyin_track(y, sr, frame_length=2048, hop_length=512, fmin=FMIN, fmax=FMAX, center=True):
+    """PitchTrack of a signal from librosa.pyin (confidence: voicing probability)."""
+    if not center and len(y) < frame_length:
+        return PitchTrack(np.zeros(0), np.zeros(0))
+    f0, voiced, voiced_probability = librosa.pyin(
+        y,
+        fmin=fmin,
+        fmax=fmax,
+        sr=sr,
+        frame_length=frame_length,
+        hop_length=hop_length,
+        center=center,
+    )
+    return PitchTrack(np.where(voiced, np.nan_to_num(f0), 0.0), voiced_probability)
+
+
+def estimate_pitch(y, sr, backend="piptrack", n_fft=2048, hop_length=512, center=True, magnitude=None):
+    """Compute the PitchTrack of a signal with a pitch backend.
+
+    Args:
+        y: audio samples
+        sr: sample rate
+        backend: one of PITCH_BACKENDS
+        n_fft: frame length
+        hop_length: hop size in samples
+        center: frames are centered as in librosa.stft(center=True)
+        magnitude: precomputed |STFT| of y with the same framing (piptrack only)
+
+    Returns:
+        PitchTrack: one f0 and confidence per frame
+    """
+    check_backend(backend)
+    if backend == "piptrack":
+        if magnitude is None:
+            magnitude = np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length, center=center))
+        return piptrack_track(magnitude, sr, n_fft=n_fft, hop_length=hop_length)
+    estimator = yin_track if backend == "yin" else pyin_track
+    return estimator(y, sr, frame_length=n_fft, hop_length=hop_length, center=center)
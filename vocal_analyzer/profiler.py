@@ -0,0 +1,168 @@
+"""Per-stage wall time, CPU time and memory instrumentation (va --profile).
+
+A StageProfiler records, for every pipeline stage of one analysis run:
+
+    wall_seconds        elapsed time of the stage
+    cpu_seconds         CPU time of the thread running the stage (work done
+                        in scheduler worker processes is not included)
+    rss_peak_mb         peak resident set size of the process after the stage
+    rss_growth_mb       how much the stage raised that peak
+    traced_peak_mb      peak Python/NumPy allocations during the stage, over
+                        what was allocated when it started (tracemalloc)
+
+cProfile and tracemalloc peaks are process-wide, so a profiled pipeline
+runs its stages one at a time (see Pipeline.run): the figures of a stage
+then cover that stage alone, and the run's wall time is the sum of its
+stages rather than their overlap. Optionally each stage is run under
+cProfile and dumped to a .prof file.
+"""
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def _rss_peak_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class StageProfiler:
+    """Collects stage measurements for one analysis run.
+
+    Arguments:
+        cprofile_dir: directory for one cProfile dump per stage (None to skip)
+        trace_memory: track allocations with tracemalloc (slows Python code)
+    """
+
+    def __init__(self, cprofile_dir=None, trace_memory=True):
+        self.cprofile_dir = cprofile_dir
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self._started = None
+        self._wall = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Begin the run (starts tracemalloc if it isn't running)."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """End the run and stop tracemalloc."""
+        if self._started is not None:
+            self._wall = time.perf_counter() - self._started
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        """Measure the code run in the block as stage name."""
+        traced_start = 0
+        if self.trace_memory and tracemalloc.is_tracing():
+            traced_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        rss_start = _rss_peak_mb()
+        profile = None
+        if self.cprofile_dir is not None:
+            profile = cProfile.Profile()
+            profile.enable()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            cpu = time.thread_time() - cpu_start
+            wall = time.perf_counter() - wall_start
+            if profile is not None:
+                profile.disable()
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{name}.prof"))
+            rss_peak = _rss_peak_mb()
+            record = {
+                "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(cpu, 4),
+                "rss_peak_mb": round(rss_peak, 1),
+                "rss_growth_mb": round(rss_peak - rss_start, 1),
+            }
+            if self.trace_memory and tracemalloc.is_tracing():
+                peak = tracemalloc.get_traced_memory()[1]
+                record["traced_peak_mb"] = round(max(peak - traced_start, 0) / 2**20, 1)
+            with self._lock:
+                self.stages[name] = record
+
+    def report(self):
+        """Measurements of the run as a JSON-serializable dict."""
+        return {
+            "wall_seconds": round(self._wall, 4),
+            "rss_peak_mb": round(_rss_peak_mb(), 1),
+            "stages": dict(self.stages),
+        }
+
+    def write(self, path, **extra):
+        """Write the report (plus extra fields) as a JSON sidecar file."""
+        with open(path, "w") as f:
+            json.dump({**extra, **self.report()}, f, indent=2)
+        return path
+
+
+def profile_path(input_file, output_dir):
+    """Path of the JSON sidecar next to <name>_analysis.md."""
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    return os.path.join(output_dir, f"{base_name}_profile.json")
+
+
+def summarize(reports):
+    """Aggregate the stage measurements of several runs.
+
+    Args:
+        reports: list of StageProfiler.report() dicts
+
+    Returns:
+        dict: stage name -> runs, total/mean/max wall seconds, total CPU
+        seconds and max RSS growth / traced peak
+    """
+    summary = {}
+    for report in reports:
+        for name, record in report["stages"].items():
+            entry = summary.setdefault(
+                name,
+                {"runs": 0, "total_wall_seconds": 0.0, "max_wall_seconds": 0.0,
+                 "total_cpu_seconds": 0.0, "max_rss_growth_mb": 0.0, "max_traced_peak_mb": 0.0},
+            )
+            entry["runs"] += 1
+            entry["total_wall_seconds"] += record["wall_seconds"]
+            entry["max_wall_seconds"] = max(entry["max_wall_seconds"], record["wall_seconds"])
+            entry["total_cpu_seconds"] += record["cpu_seconds"]
+            entry["max_rss_growth_mb"] = max(entry["max_rss_growth_mb"], record["rss_growth_mb"])
+            entry["max_traced_peak_mb"] = max(
+                entry["max_traced_peak_mb"], record.get("traced_peak_mb", 0.0)
+            )
+    for entry in summary.values():
+        entry["mean_wall_seconds"] = entry["total_wall_seconds"] / entry["runs"]
+        for key, value in entry.items():
+            if isinstance(value, float):
+                entry[key] = round(value, 4)
+    return summary
+
+
+def print_summary(summary, files):
+    """Print the per-stage summary of a batch, slowest stages first."""
+    print()
+    print(f"Stage profile ({files} files)")
+    print("=" * 60)
+    print(f"  {'stage':16s} {'runs':>4s} {'total s':>9s} {'mean s':>8s} {'max s':>8s} {'cpu s':>8s} {'peak MB':>8s}")
+    for name, entry in sorted(summary.items(), key=lambda item: -item[1]["total_wall_seconds"]):
+        print(
+            f"  {name:16s} {entry['runs']:4d} {entry['total_wall_seconds']:9.2f} "
+            f"{entry['mean_wall_seconds']:8.2f} {entry['max_wall_seconds']:8.2f} "
+            f"{entry['total_cpu_seconds']:8.2f} {entry['max_traced_peak_mb']:8.1f}"
+        )
@@ -1,8 +1,8 @@
-import librosa
-import matplotlib.pyplot as plt
 import numpy as np
 import os
 
+from .spectral import SpectralContext, load_spectral, spectral_settings
+
 
 def frequency_to_note(frequency):
     """Convert frequency in Hz to musical note name."""
@@ -116,22 +116,114 @@ def notes_for_plotting(min_freq, max_freq, num_bins=50):
     return generate_all_notes_in_range(min_freq, max_freq)
 
 
+def pitch_plot_path(audio_file, output_dir, plot_format="png"):
+    """Path of the pitch distribution plot for an audio file."""
+    base_name = os.path.splitext(os.path.basename(audio_file))[0]
+    return os.path.join(output_dir, f"{base_name}_pitch_distribution.{plot_format}")
+
+
+def render_pitch_plot(range_results, plot_file, dpi=300):
+    """Render the pitch histogram of RangeAnalyzer results to an image file.
+
+    Uses the object-oriented Figure API (no global pyplot state), so plots
+    can be rendered concurrently from threads or worker processes. The image
+    format follows the file extension (e.g. .png or .svg).
+
+    Args:
+        range_results: Results of RangeAnalyzer.analyze (with histogram data)
+        plot_file: Output image path
+        dpi: Resolution for raster formats
+
+    Returns:
+        str: plot_file
+    """
+    from matplotlib.figure import Figure
+
+    counts = np.asarray(range_results["histogram"]["counts"])
+    edges = np.asarray(range_results["histogram"]["edges"])
+    min_pitch = range_results["min_pitch"]
+    max_pitch = range_results["max_pitch"]
+
+    fig = Figure(figsize=(14, 6))
+    ax = fig.subplots()
+    # Plot histogram (pre-binned, so streamed analyses plot the same way)
+    n, bins, patches = ax.hist(
+        edges[:-1], bins=edges, weights=counts,
+        color="#4CAF50", edgecolor="#000000", alpha=0.7,
+    )
+
+    # Set up x-axis with note labels for every note in range
+    freq_positions, note_labels = notes_for_plotting(min_pitch, max_pitch)
+    if freq_positions and note_labels:
+        ax.set_xticks(freq_positions, note_labels, rotation=45, fontsize=8)
+
+        # Add octave boundary lines
+        octave_boundaries = get_octave_boundaries(freq_positions, note_labels)
+        for boundary_freq in octave_boundaries:
+            ax.axvline(x=boundary_freq, color="red", linestyle="--", alpha=0.5, linewidth=1)
+
+        # Add octave labels at the top
+        octaves_in_range = set(int(note[-1]) for note in note_labels)
+        for octave in sorted(octaves_in_range):
+            # Find first C note in this octave for labeling position
+            c_note = f"C{octave}"
+            if c_note in note_labels:
+                c_freq = note_to_frequency(c_note)
+                ax.text(
+                    c_freq,
+                    max(n) * 1.05,
+                    f"Octave {octave}",
+                    ha="left",
+                    va="bottom",
+                    fontsize=9,
+                    fontweight="bold",
+                    color="darkblue",
+                    alpha=0.8,
+                )
+
+    ax.set_xlabel("Musical Notes (with Octave Numbers)")
+    ax.set_ylabel("Frequency")
+    ax.set_title(f"Vocal Pitch Distribution ({range_results['total_samples']:,} voiced frames)")
+
+    # bbox_inches="tight" keeps the rotated labels from being cut off
+    fig.savefig(plot_file, dpi=dpi, bbox_inches="tight")
+    return plot_file
+
+
 class RangeAnalyzer:
-    """Analyze vocal range and plot pitch distribution."""
+    """Analyze vocal range and compute the pitch distribution.
+
+    Rendering the distribution is separate (render_pitch_plot), so the
+    analysis never waits on matplotlib.
+    """
 
-    def __init__(self, audio_file, output_dir):
+    def __init__(self, audio_file, output_dir, y=None, sr=None, spectral=None, profile=None):
         self.audio_file = audio_file
         self.output_dir = output_dir
+        # Quality profile used when no spectral context is given
+        self.profile = profile
+        # Already-decoded audio and spectral context (or StreamingContext),
+        # shared with the other stages
+        self.y = y
+        self.sr = sr
+        self.spectral = spectral
 
     def analyze(self):
-        """Analyze pitch range and generate a histogram."""
-        y, sr = librosa.load(self.audio_file)
-        pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-        # Get pitches where magnitude is above threshold
-        threshold = np.median(magnitudes)
-        pitches = pitches[magnitudes > threshold]
-        pitches = pitches[pitches > 0]
-        if len(pitches) == 0:
+        """Analyze pitch range and compute the histogram data.
+
+        Returns:
+            dict: min/max pitch and note, total_samples, histogram (bin
+            counts and edges for render_pitch_plot) and plot_file (None
+            until a plot is rendered)
+        """
+        if self.spectral is None:
+            if self.y is None:
+                self.spectral = load_spectral(self.audio_file, self.profile)
+            else:
+                self.spectral = SpectralContext(self.y, self.sr, **spectral_settings(self.profile))
+        # Statistics of the dominant f0 of every voiced frame
+        stats = self.spectral.pitch_statistics
+        if stats.count == 0:
             return {
                 "min_pitch": 0,
                 "max_pitch": 0,
@@ -140,60 +232,15 @@ class RangeAnalyzer:
                 "plot_file": None,
             }
 
-        min_pitch = np.min(pitches)
-        max_pitch = np.max(pitches)
-        total_samples = len(pitches)
+        min_pitch = stats.minimum
+        max_pitch = stats.maximum
+        total_samples = stats.count
 
         # Convert to notes
         min_note = frequency_to_note(min_pitch)
         max_note = frequency_to_note(max_pitch)
 
-        # Plot histogram
-        plt.figure(figsize=(14, 6))
-        n, bins, patches = plt.hist(
-            pitches, bins=50, color="#4CAF50", edgecolor="#000000", alpha=0.7
-        )
-
-        # Set up x-axis with note labels for every note in range
-        freq_positions, note_labels = notes_for_plotting(min_pitch, max_pitch)
-        if freq_positions and note_labels:
-            plt.xticks(freq_positions, note_labels, rotation=45, fontsize=8)
-
-            # Add octave boundary lines
-            octave_boundaries = get_octave_boundaries(freq_positions, note_labels)
-            for boundary_freq in octave_boundaries:
-                plt.axvline(
-                    x=boundary_freq, color="red", linestyle="--", alpha=0.5, linewidth=1
-                )
-
-            # Add octave labels at the top
-            octaves_in_range = set(int(note[-1]) for note in note_labels)
-            for octave in sorted(octaves_in_range):
-                # Find first C note in this octave for labeling position
-                c_note = f"C{octave}"
-                if c_note in note_labels:
-                    c_freq = note_to_frequency(c_note)
-                    plt.text(
-                        c_freq,
-                        max(n) * 1.05,
-                        f"Octave {octave}",
-                        ha="left",
-                        va="bottom",
-                        fontsize=9,
-                        fontweight="bold",
-                        color="darkblue",
-                        alpha=0.8,
-                    )
-
-        plt.xlabel("Musical Notes (with Octave Numbers)")
-        plt.ylabel("Frequency")
-        plt.title(f"Vocal Pitch Distribution ({total_samples:,} samples)")
-        plt.tight_layout()  # Adjust layout to prevent label cutoff
-
-        base_name = os.path.splitext(os.path.basename(self.audio_file))[0]
-        plot_file = os.path.join(self.output_dir, f"{base_name}_pitch_distribution.png")
-        plt.savefig(plot_file, dpi=300, bbox_inches="tight")
-        plt.close()
+        counts, edges = self.spectral.pitch_histogram(bins=50)
 
         return {
             "min_pitch": min_pitch,
@@ -201,5 +248,6 @@ class RangeAnalyzer:
             "min_note": min_note,
             "max_note": max_note,
             "total_samples": total_samples,
-            "plot_file": plot_file,
+            "histogram": {"counts": counts.tolist(), "edges": edges.tolist()},
+            "plot_file": None,
         }
@@ -0,0 +1,180 @@
+"""Run independent CPU-bound analysis stages concurrently in worker processes.
+
+Decoded audio is published once in shared memory and workers map it
+directly, so a multi-minute track is not pickled and copied into every
+worker.
+"""
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Picklable reference to decoded audio living in a shared memory block
+SharedAudioHandle = namedtuple("SharedAudioHandle", ["name", "shape", "dtype", "sr"])
+
+
+class SharedAudio:
+    """Decoded audio copied into a shared memory block owned by this process."""
+
+    def __init__(self, y, sr):
+        self._shm = shared_memory.SharedMemory(create=True, size=max(y.nbytes, 1))
+        buffer = np.ndarray(y.shape, dtype=y.dtype, buffer=self._shm.buf)
+        buffer[:] = y
+        self.handle = SharedAudioHandle(self._shm.name, y.shape, y.dtype.str, sr)
+
+    def close(self):
+        """Free the shared memory block."""
+        self._shm.close()
+        self._shm.unlink()
+
+
+@contextmanager
+def attach(handle):
+    """Map shared audio into this process.
+
+    Yields:
+        tuple: (samples, sample_rate); callers should drop every reference to
+        samples before the block exits so the mapping can be closed
+    """
+    shm = shared_memory.SharedMemory(name=handle.name)
+    y = None
+    try:
+        y = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=shm.buf)
+        yield y, handle.sr
+    finally:
+        del y
+        try:
+            shm.close()
+        except BufferError:
+            # A view is still alive; the mapping is released along with it
+            pass
+
+
+class StageScheduler:
+    """Process pool for CPU-bound analysis stages.
+
+    The pool is started on first use and kept for the lifetime of the
+    scheduler, so worker start-up and imports are paid once per run or batch.
+
+    Arguments:
+        max_workers: number of worker processes (None for one per stage group)
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or 2
+        self._executor = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in a worker process.
+
+        Returns:
+            concurrent.futures.Future: the pending result
+        """
+        if self._executor is None:
+            # spawn avoids forking a (possibly multi-threaded) parent process
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def run_vocal_stages(audio, audio_file, output_dir, range_analysis=True, profile=None):
+    """Worker: feature extraction and range analysis on the vocal stem.
+
+    Both stages run in the same worker so they share one spectral context
+    (and therefore one piptrack pass).
+
+    Args:
+        audio: SharedAudioHandle of the decoded vocal stem
+        audio_file: Path the audio was decoded from
+        output_dir: Directory for the pitch plot
+        range_analysis: Also run RangeAnalyzer
+        profile: Quality profile settings for the spectral analysis
+
+    Returns:
+        tuple: (features, range_results)
+    """
+    from .feature_extractor import extract_features
+    from .range_analyzer import RangeAnalyzer
+    from .spectral import SpectralContext, spectral_settings
+
+    with attach(audio) as (y, sr):
+        spectral = SpectralContext(y, sr, **spectral_settings(profile))
+        features = extract_features(audio_file, spectral=spectral)
+        range_results = {}
+        if range_analysis:
+            range_results = RangeAnalyzer(audio_file, output_dir, spectral=spectral).analyze()
+        del y, spectral
+    return features, range_results
+
+
+def run_streaming_vocal_stages(audio_file, output_dir, range_analysis=True, profile=None, block_frames=2048):
+    """Worker: feature extraction and range analysis on a long vocal stem.
+
+    The stem is streamed from disk block by block (see streaming.py) instead
+    of being decoded and shared in memory.
+
+    Args:
+        audio_file: Path to the vocal stem
+        output_dir: Directory for the pitch plot
+        range_analysis: Also run RangeAnalyzer
+        profile: Quality profile settings (sample rate, resampler, FFT/hop)
+        block_frames: Frames analyzed per block
+
+    Returns:
+        tuple: (features, range_results)
+    """
+    from .feature_extractor import extract_features
+    from .range_analyzer import RangeAnalyzer
+    from .streaming import streaming_context
+
+    context = streaming_context(audio_file, profile, block_frames)
+    features = extract_features(audio_file, spectral=context)
+    range_results = {}
+    if range_analysis:
+        range_results = RangeAnalyzer(audio_file, output_dir, spectral=context).analyze()
+    return features, range_results
+
+
+def run_key_stage(audio, audio_file, profile=None, timeline=None, source=None):
+    """Worker: key detection on the full mix or on harmonic stems.
+
+    Args:
+        audio: SharedAudioHandle of the decoded mix, or a list of handles of
+            harmonic stems to sum (then source describes them)
+        audio_file: Path the audio was decoded from
+        profile: Quality profile settings for the spectral analysis
+        timeline: Key timeline window/step settings (None to skip the timeline)
+        source: Description of the harmonic stems (None for the full mix)
+
+    Returns:
+        dict: key detection results from find_key
+    """
+    from .key_finder import find_key, mix_down
+    from .spectral import SpectralContext, spectral_settings
+
+    if isinstance(audio, list):
+        # Sum the stems into a private array, one mapping at a time
+        y = None
+        for handle in audio:
+            with attach(handle) as (stem, sr):
+                y = mix_down([stem] if y is None else [y, stem])
+                del stem
+        spectral = SpectralContext(y, sr, **spectral_settings(profile))
+        return find_key(audio_file, spectral=spectral, timeline=timeline, source=source)
+
+    with attach(audio) as (y, sr):
+        spectral = SpectralContext(y, sr, **spectral_settings(profile))
+        key_info = find_key(audio_file, spectral=spectral, timeline=timeline)
+        del y, spectral
+    return key_info
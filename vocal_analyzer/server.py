@@ -0,0 +1,345 @@
+"""Long-running analysis server with warm models.
+
+Started with ``va serve``. Keeps the heavy analysis modules imported and
+the separation model loaded, and accepts analysis jobs over localhost HTTP
+or a Unix socket:
+
+    POST /analyze    {"input_file": "...", "output_dir": "...", "all_stems": false,
+                      "model": "...", "wait": true}
+    GET  /jobs/<id>  status (and result once finished) of a submitted job
+    GET  /health     queue and worker status
+
+Jobs go through a bounded queue; when it is full the server answers 503
+instead of accepting more work than it can hold. Only the most recent
+finished jobs are kept for GET /jobs/<id>.
+"""
+import argparse
+import collections
+import http.server
+import itertools
+import json
+import os
+import queue
+import socketserver
+import tempfile
+import threading
+
+from .cache import json_default
+from .catalog import Catalog
+from .config import Config
+from .main import (
+    AnalysisSession,
+    analyze_file,
+    default_output_dir,
+    make_pcm_cache,
+    make_result_cache,
+)
+from .openai_transport import configure as configure_openai
+from .output_generator import flush_parquet
+from .scheduler import StageScheduler
+from .vocal_extractor import configure_model_list, configure_separation
+
+
+class Job:
+    """A single analysis request and its outcome."""
+
+    def __init__(self, job_id, input_file, output_dir, model, extract_all):
+        self.id = job_id
+        self.input_file = input_file
+        self.output_dir = output_dir
+        self.model = model
+        self.extract_all = extract_all
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        data = {"id": self.id, "status": self.status, "input_file": self.input_file}
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class AnalysisServer:
+    """Runs analysis jobs from a bounded queue on a fixed pool of workers.
+
+    Queued and running jobs are always in `jobs`; of the finished ones only
+    the last max_finished_jobs are, so a long-lived server does not keep
+    every result it ever produced.
+    """
+
+    def __init__(self, config, concurrency=1, max_queue=16, quiet=False, max_finished_jobs=256):
+        self.config = config
+        self.quiet = quiet
+        self.jobs = {}
+        self.max_finished_jobs = max_finished_jobs
+        self._finished = collections.deque()
+        self._running = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.profile = config.quality_profile()
+        self.cache = None
+        self.pcm_cache = None
+        if config.cache["enabled"]:
+            self.cache = make_result_cache(config)
+            self.pcm_cache = make_pcm_cache(config)
+        self.catalog = None
+        if config.catalog["enabled"]:
+            self.catalog = Catalog(config.catalog["path"])
+        # One process pool for CPU-bound stages, shared by all worker threads
+        self.scheduler = None
+        if config.performance["parallel_stages"]:
+            self.scheduler = StageScheduler(max_workers=config.performance["max_workers"])
+        self._workers = [
+            threading.Thread(target=self._work, name=f"va-worker-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+
+    def start(self):
+        """Warm up the heavy modules and start the worker threads."""
+        self._warm_up()
+        for worker in self._workers:
+            worker.start()
+
+    def _warm_up(self):
+        """Import heavy dependencies and load the default separation model."""
+        import librosa  # noqa: F401
+        import matplotlib.figure  # noqa: F401
+
+        if self.config.is_enabled("vocal_extraction"):
+            from .vocal_extractor import get_separator
+
+            model = self.config.extraction["model"]
+            if not self.quiet:
+                print(f"Loading separation model: {model}")
+            get_separator(model, tempfile.gettempdir(), output_single_stem="Vocals")
+
+    def submit(self, input_file, output_dir=None, model=None, extract_all=None):
+        """Queue an analysis job.
+
+        Args:
+            input_file: Path to input audio file
+            output_dir: Directory for output files (defaults to <name>-analysis)
+            model: Separation model (defaults to config)
+            extract_all: Extract all stems (defaults to config)
+
+        Returns:
+            Job: the queued job
+
+        Raises:
+            queue.Full: if the job queue is at capacity
+        """
+        with self._lock:
+            job = Job(
+                next(self._ids),
+                input_file,
+                output_dir or default_output_dir(input_file),
+                model or self.config.extraction["model"],
+                self.config.extraction["extract_all_stems"] if extract_all is None else extract_all,
+            )
+            self._queue.put_nowait(job)
+            self.jobs[job.id] = job
+        return job
+
+    def status(self):
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "workers": len(self._workers),
+            "running": self._running,
+        }
+
+    def flush(self):
+        """Write queued Parquet rows; a failure is reported, not raised, so
+        it never turns a finished analysis into a failed one."""
+        try:
+            flush_parquet()
+        except Exception as e:
+            print(f"Warning: could not write Parquet results: {e}")
+
+    def _finish(self, job):
+        """Mark a job finished and forget the oldest finished jobs past the limit."""
+        with self._lock:
+            self._running -= 1
+            self._finished.append(job.id)
+            while len(self._finished) > self.max_finished_jobs:
+                self.jobs.pop(self._finished.popleft(), None)
+
+    def _work(self):
+        """Worker loop: run queued jobs one at a time."""
+        session = AnalysisSession(
+            profile=self.profile,
+            scheduler=self.scheduler,
+            pcm_cache=self.pcm_cache,
+        )
+        quiet = self.quiet or self.config.output["quiet_mode"]
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                job.status = "running"
+                self._running += 1
+            try:
+                result = analyze_file(
+                    job.input_file,
+                    job.output_dir,
+                    self.config,
+                    session,
+                    job.model,
+                    job.extract_all,
+                    quiet,
+                    self.cache,
+                    catalog=self.catalog,
+                )
+                with open(result["analysis_file"]) as f:
+                    result["report"] = f.read()
+                job.result = result
+                job.status = "done"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                session.clear()
+                self._finish(job)
+                if self._queue.empty():
+                    # Write the Parquet rows of a burst of jobs as one file
+                    self.flush()
+                job.done.set()
+                self._queue.task_done()
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP front end for an AnalysisServer (set as the `analysis` class attribute)."""
+
+    analysis = None
+    quiet = False
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, code, data):
+        body = json.dumps(data, default=json_default).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", **self.analysis.status()})
+        elif self.path.startswith("/jobs/"):
+            try:
+                job = self.analysis.jobs[int(self.path[len("/jobs/"):])]
+            except (KeyError, ValueError):
+                self._send_json(404, {"error": "unknown job"})
+                return
+            self._send_json(200, job.to_dict())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/analyze":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            input_file = request["input_file"]
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": "expected a JSON body with input_file"})
+            return
+
+        try:
+            job = self.analysis.submit(
+                input_file,
+                output_dir=request.get("output_dir"),
+                model=request.get("model"),
+                extract_all=request.get("all_stems"),
+            )
+        except queue.Full:
+            self._send_json(503, {"error": "job queue is full, retry later"})
+            return
+
+        if not request.get("wait", True):
+            self._send_json(202, job.to_dict())
+            return
+
+        job.done.wait()
+        self._send_json(200 if job.status == "done" else 500, job.to_dict())
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_main(argv=None):
+    """Entry point for `va serve`."""
+    parser = argparse.ArgumentParser(prog="va serve", description="Vocal Analyzer server")
+    parser.add_argument("--config", default=None, help="Path to config file")
+    parser.add_argument("--host", default=None, help="Host to bind (overrides config)")
+    parser.add_argument("--port", type=int, default=None, help="Port to bind (overrides config)")
+    parser.add_argument("--socket", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent analysis jobs")
+    parser.add_argument("--max-queue", type=int, default=None, help="Maximum queued jobs")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Run in quiet mode")
+    args = parser.parse_args(argv)
+
+    config = Config(config_path=args.config)
+    configure_openai(**config.api)
+    configure_model_list(config.cache["models_file"], config.cache["models_ttl_hours"])
+    configure_separation(config.extraction)
+    settings = dict(config.server)
+    for key in ("host", "port", "socket", "workers", "max_queue"):
+        value = getattr(args, key)
+        if value is not None:
+            settings[key] = value
+
+    analysis = AnalysisServer(
+        config,
+        concurrency=max(1, int(settings["workers"])),
+        max_queue=max(1, int(settings["max_queue"])),
+        quiet=args.quiet,
+        max_finished_jobs=max(0, int(settings["max_finished_jobs"])),
+    )
+    analysis.start()
+
+    handler = type(
+        "RequestHandler", (_RequestHandler,), {"analysis": analysis, "quiet": args.quiet}
+    )
+    if settings["socket"]:
+        if os.path.exists(settings["socket"]):
+            os.unlink(settings["socket"])
+        httpd = _ThreadingUnixHTTPServer(settings["socket"], handler)
+        where = settings["socket"]
+    else:
+        httpd = _ThreadingHTTPServer((settings["host"], int(settings["port"])), handler)
+        where = f"http://{settings['host']}:{settings['port']}"
+
+    print(f"Vocal Analyzer server listening on {where}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        analysis.flush()
+        if analysis.scheduler is not None:
+            analysis.scheduler.shutdown()
+        if settings["socket"] and os.path.exists(settings["socket"]):
+            os.unlink(settings["socket"])
@@ -0,0 +1,153 @@
+"""Shared spectral analysis context for a decoded signal."""
+import librosa
+import numpy as np
+
+from .config import QUALITY_PROFILES
+from .pitch import check_backend, estimate_pitch
+from .streaming import PitchStatistics
+
+
+def spectral_settings(profile=None):
+    """SpectralContext keyword arguments of a quality profile (default balanced)."""
+    profile = profile or QUALITY_PROFILES["balanced"]
+    settings = {key: profile[key] for key in ("n_fft", "hop_length", "bins_per_octave")}
+    settings["pitch_backend"] = profile.get("pitch_backend", "piptrack")
+    return settings
+
+
+def load_spectral(audio_file, profile=None):
+    """Decode an audio file as a quality profile specifies and wrap it in a SpectralContext."""
+    profile = profile or QUALITY_PROFILES["balanced"]
+    y, sr = librosa.load(audio_file, sr=profile["sample_rate"], res_type=profile["res_type"])
+    return SpectralContext(y, sr, **spectral_settings(profile))
+
+
+class SpectralContext:
+    """Lazily computed, memoized spectral representations of one signal.
+
+    Every representation (STFT, magnitude, pitch track, onset envelope,
+    chroma) is computed the first time a stage asks for it and reused by
+    every later stage, so e.g. piptrack runs once per signal instead of once
+    per stage.
+
+    Arguments:
+        y: decoded audio samples
+        sr: sample rate of y
+        n_fft: FFT size used for the STFT and pitch tracking
+        hop_length: hop size (in samples) shared by all frame-based features
+        bins_per_octave: CQT resolution of the chroma
+        pitch_backend: how the pitch track is estimated (see pitch.py)
+    """
+
+    def __init__(
+        self, y, sr, n_fft=2048, hop_length=512, bins_per_octave=24, pitch_backend="piptrack"
+    ):
+        check_backend(pitch_backend)
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.bins_per_octave = bins_per_octave
+        self.pitch_backend = pitch_backend
+        self._cache = {}
+
+    def _memo(self, name, compute):
+        """Return the cached value for name, computing it on first use."""
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
+
+    @property
+    def stft(self):
+        """Complex STFT of the signal."""
+        return self._memo(
+            "stft",
+            lambda: librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length),
+        )
+
+    @property
+    def magnitude(self):
+        """Magnitude spectrogram (|STFT|)."""
+        return self._memo("magnitude", lambda: np.abs(self.stft))
+
+    @property
+    def pitch_track(self):
+        """Compact PitchTrack (dominant f0 and confidence per frame) from the pitch backend."""
+        return self._memo(
+            "pitch_track",
+            lambda: estimate_pitch(
+                self.y,
+                self.sr,
+                backend=self.pitch_backend,
+                n_fft=self.n_fft,
+                hop_length=self.hop_length,
+                magnitude=self.magnitude if self.pitch_backend == "piptrack" else None,
+            ),
+        )
+
+    @property
+    def pitch_statistics(self):
+        """PitchStatistics (count, min/max/mean) of the voiced frames' f0."""
+        return self._memo(
+            "pitch_statistics", lambda: PitchStatistics.from_samples(self.pitch_track.pitches)
+        )
+
+    def pitch_histogram(self, bins=50):
+        """(counts, edges) histogram of the voiced frames' f0."""
+        return np.histogram(self.pitch_track.pitches, bins=bins)
+
+    @property
+    def max_amplitude(self):
+        """Peak absolute sample value."""
+        return self._memo("max_amplitude", lambda: float(np.max(np.abs(self.y))))
+
+    @property
+    def onset_envelope(self):
+        """Onset strength envelope, as used by librosa.beat.beat_track."""
+        return self._memo(
+            "onset_envelope",
+            lambda: librosa.onset.onset_strength(
+                y=self.y,
+                sr=self.sr,
+                n_fft=self.n_fft,
+                hop_length=self.hop_length,
+                aggregate=np.median,
+            ),
+        )
+
+    @property
+    def chroma(self):
+        """Constant-Q chromagram of the signal."""
+        return self._memo(
+            "chroma",
+            lambda: librosa.feature.chroma_cqt(
+                y=self.y,
+                sr=self.sr,
+                hop_length=self.hop_length,
+                bins_per_octave=self.bins_per_octave,
+            ),
+        )
+
+    @property
+    def harmonic(self):
+        """SpectralContext of the harmonic component (HPSS of the cached STFT)."""
+
+        def compute():
+            stft_harmonic, _ = librosa.decompose.hpss(self.stft)
+            y_harmonic = librosa.istft(
+                stft_harmonic,
+                n_fft=self.n_fft,
+                hop_length=self.hop_length,
+                dtype=self.y.dtype,
+                length=len(self.y),
+            )
+            return SpectralContext(
+                y_harmonic,
+                self.sr,
+                n_fft=self.n_fft,
+                hop_length=self.hop_length,
+                bins_per_octave=self.bins_per_octave,
+                pitch_backend=self.pitch_backend,
+            )
+
+        return self._memo("harmonic", compute)
@@ -0,0 +1,285 @@
+"""Streaming block-wise pitch and range analysis for very long recordings.
+
+SpectralContext decodes a whole file and keeps full (bins x frames) STFT and
+piptrack matrices in memory, which takes gigabytes for hour-long live sets.
+StreamingContext instead reads, resamples and analyzes the file in blocks of
+frames and only keeps running statistics (pitch min/max/mean, a fine pitch
+histogram, sample totals), one onset value per frame and the peak amplitude,
+so peak memory is bounded by the block size.
+
+Frames are laid out exactly as librosa.stft(center=True) lays them out
+(constant padding of n_fft // 2 at both ends) and the pitch track is
+computed frame by frame, so the pitch statistics match the in-memory path.
+"""
+import itertools
+
+import librosa
+import numpy as np
+import soundfile as sf
+import soxr
+
+from .config import QUALITY_PROFILES
+from .pitch import check_backend, estimate_pitch
+
+
+class PitchStatistics:
+    """Running statistics of pitch samples (Hz).
+
+    Keeps the sample count, sum, min and max plus a fine log-frequency
+    histogram (1 cent resolution by default) from which coarser histograms
+    over the observed range can be derived without keeping the samples.
+
+    Arguments:
+        fmin: lowest frequency of the fine histogram
+        octaves: number of octaves covered by the fine histogram
+        bins_per_octave: resolution of the fine histogram
+    """
+
+    def __init__(self, fmin=16.0, octaves=10, bins_per_octave=1200):
+        self.fmin = fmin
+        self.bins_per_octave = bins_per_octave
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self._fine = np.zeros(octaves * bins_per_octave, dtype=np.int64)
+
+    @classmethod
+    def from_samples(cls, pitches):
+        """Build statistics from an in-memory array of pitch samples."""
+        stats = cls()
+        stats.update(pitches)
+        return stats
+
+    def update(self, pitches):
+        """Add a block of pitch samples."""
+        if len(pitches) == 0:
+            return
+        low, high = float(np.min(pitches)), float(np.max(pitches))
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+        self.count += len(pitches)
+        self.total += float(np.sum(pitches, dtype=np.float64))
+
+        index = np.floor(self.bins_per_octave * np.log2(pitches / self.fmin)).astype(np.int64)
+        index = np.clip(index, 0, len(self._fine) - 1)
+        self._fine += np.bincount(index, minlength=len(self._fine))
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def histogram(self, bins=50):
+        """Histogram over [minimum, maximum] with equal-width bins.
+
+        Returns:
+            tuple: (counts, edges) like np.histogram
+        """
+        edges = np.linspace(self.minimum, self.maximum, bins + 1)
+        occupied = np.nonzero(self._fine)[0]
+        centers = self.fmin * np.power(2.0, (occupied + 0.5) / self.bins_per_octave)
+        centers = np.clip(centers, self.minimum, self.maximum)
+        counts, _ = np.histogram(centers, bins=edges, weights=self._fine[occupied])
+        return counts.astype(np.int64), edges
+
+
+def stream_audio(audio_file, sr=22050, block_length=65536, res_type="soxr_hq"):
+    """Yield mono float32 blocks of an audio file resampled to sr.
+
+    Mirrors librosa.load (mono downmix, then soxr resampling) without
+    holding the whole signal in memory.
+    """
+    with sf.SoundFile(audio_file) as f:
+        resampler = None
+        if f.samplerate != sr:
+            resampler = soxr.ResampleStream(f.samplerate, sr, 1, dtype="float32", quality=res_type)
+        for block in f.blocks(blocksize=block_length, dtype="float32", always_2d=True):
+            mono = block.mean(axis=1, dtype=np.float32)
+            yield resampler.resample_chunk(mono) if resampler else mono
+        if resampler:
+            yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+
+def stream_segments(blocks, n_fft=2048, hop_length=512, block_frames=2048):
+    """Regroup sample blocks into segments spanning block_frames frames.
+
+    Frames are positioned as in librosa.stft(center=True): the signal is
+    zero-padded by n_fft // 2 at both ends. Consecutive segments overlap by
+    n_fft - hop_length samples, so analyzing each with center=False yields
+    every frame exactly once.
+
+    Yields:
+        ndarray: samples of up to block_frames consecutive frames
+    """
+    pad = np.zeros(n_fft // 2, dtype=np.float32)
+    span = (block_frames - 1) * hop_length + n_fft
+    buffer = pad
+    final = False
+    for block in itertools.chain(blocks, [None]):
+        if block is None:
+            buffer = np.concatenate([buffer, pad])
+            final = True
+        else:
+            buffer = np.concatenate([buffer, block])
+        while len(buffer) >= span or (final and len(buffer) >= n_fft):
+            n_frames = min(block_frames, 1 + (len(buffer) - n_fft) // hop_length)
+            yield buffer[: (n_frames - 1) * hop_length + n_fft]
+            # Keep the n_fft - hop_length samples the next frame overlaps
+            buffer = buffer[n_frames * hop_length:]
+
+
+class StreamingContext:
+    """Block-wise spectral summary of an audio file with bounded memory.
+
+    Provides the part of the SpectralContext interface used by feature
+    extraction and range analysis (pitch_statistics, onset_envelope,
+    max_amplitude). The file is scanned on first access.
+
+    Pitch statistics are accumulated from each block's PitchTrack. piptrack
+    and yin are frame-local and match the in-memory result; pyin is decoded
+    block by block, which can differ slightly at block boundaries from
+    decoding the whole file. The onset envelope
+    applies power_to_db's 80 dB floor relative to the loudest bin seen so
+    far rather than in the whole file, which only affects near-silent bins.
+
+    Arguments:
+        audio_file: path to the audio file
+        sr: analysis sample rate
+        n_fft: FFT size
+        hop_length: hop size in samples
+        block_frames: frames analyzed per block (bounds peak memory)
+        res_type: soxr resampling quality
+        pitch_backend: how the pitch track is estimated (see pitch.py)
+    """
+
+    y = None
+
+    def __init__(
+        self,
+        audio_file,
+        sr=22050,
+        n_fft=2048,
+        hop_length=512,
+        block_frames=2048,
+        res_type="soxr_hq",
+        pitch_backend="piptrack",
+    ):
+        check_backend(pitch_backend)
+        self.audio_file = audio_file
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.block_frames = block_frames
+        self.res_type = res_type
+        self.pitch_backend = pitch_backend
+        self._summary = None
+
+    def _blocks(self, on_samples=None):
+        samples = stream_audio(
+            self.audio_file,
+            self.sr,
+            block_length=self.block_frames * self.hop_length,
+            res_type=self.res_type,
+        )
+        if on_samples is not None:
+            samples = map(on_samples, samples)
+        return stream_segments(
+            samples,
+            n_fft=self.n_fft,
+            hop_length=self.hop_length,
+            block_frames=self.block_frames,
+        )
+
+    def _stft(self, segment):
+        return librosa.stft(segment, n_fft=self.n_fft, hop_length=self.hop_length, center=False)
+
+    def _scan(self):
+        """Single pass: pitch statistics, onset envelope and peak amplitude."""
+        stats = PitchStatistics()
+        mel_basis = librosa.filters.mel(sr=self.sr, n_fft=self.n_fft)
+        onsets = []
+        previous_db = None
+        db_max = -np.inf
+        peak = [0.0]
+
+        def track_peak(samples):
+            peak[0] = max(peak[0], float(np.max(np.abs(samples), initial=0.0)))
+            return samples
+
+        for segment in self._blocks(on_samples=track_peak):
+            magnitude = np.abs(self._stft(segment))
+            track = estimate_pitch(
+                segment,
+                self.sr,
+                backend=self.pitch_backend,
+                n_fft=self.n_fft,
+                hop_length=self.hop_length,
+                center=False,
+                magnitude=magnitude if self.pitch_backend == "piptrack" else None,
+            )
+            stats.update(track.pitches)
+
+            # Onset strength as in librosa.onset.onset_strength(aggregate=np.median)
+            db = librosa.power_to_db(mel_basis @ magnitude**2, top_db=None)
+            db_max = max(db_max, float(db.max()))
+            db = np.maximum(db, db_max - 80.0)
+            if previous_db is not None:
+                db = np.concatenate([previous_db, db], axis=1)
+            onsets.append(np.median(np.maximum(0.0, db[:, 1:] - db[:, :-1]), axis=0))
+            previous_db = db[:, -1:]
+
+        n_frames = sum(len(o) for o in onsets) + 1
+        pad_width = 1 + self.n_fft // (2 * self.hop_length)
+        onset_envelope = np.concatenate([np.zeros(pad_width)] + onsets)[:n_frames]
+
+        return {
+            "pitch_statistics": stats,
+            "onset_envelope": onset_envelope.astype(np.float32),
+            "max_amplitude": peak[0],
+        }
+
+    def _get(self, name):
+        if self._summary is None:
+            self._summary = self._scan()
+        return self._summary[name]
+
+    @property
+    def pitch_statistics(self):
+        """PitchStatistics of the voiced frames' f0."""
+        return self._get("pitch_statistics")
+
+    def pitch_histogram(self, bins=50):
+        """(counts, edges) histogram of the voiced frames' f0."""
+        return self.pitch_statistics.histogram(bins)
+
+    @property
+    def onset_envelope(self):
+        """Onset strength envelope, as used by librosa.beat.beat_track."""
+        return self._get("onset_envelope")
+
+    @property
+    def max_amplitude(self):
+        """Peak absolute sample value."""
+        return self._get("max_amplitude")
+
+
+def audio_duration(audio_file):
+    """Duration in seconds, or None if soundfile cannot stream the file."""
+    try:
+        return sf.info(audio_file).duration
+    except Exception:
+        return None
+
+
+def streaming_context(audio_file, profile, block_frames=2048):
+    """StreamingContext using a quality profile's sample rate, resampler and FFT/hop sizes."""
+    profile = profile or QUALITY_PROFILES["balanced"]
+    return StreamingContext(
+        audio_file,
+        sr=profile["sample_rate"],
+        n_fft=profile["n_fft"],
+        hop_length=profile["hop_length"],
+        block_frames=block_frames,
+        res_type=profile["res_type"],
+        pitch_backend=profile.get("pitch_backend", "piptrack"),
+    )
@@ -1,20 +1,54 @@
-from openai import OpenAI
+import asyncio
 import os
 import tempfile
+from pathlib import Path
 from pydub import AudioSegment
 
+from .openai_transport import get_transport
 
-def transcribe_audio(audio_file):
-    """Transcribe audio using OpenAI's Whisper API.
+
+def _compress_for_upload(audio_file, bitrate="64k"):
+    """Compress an audio file to a temporary mono MP3 and return its path."""
+    audio = AudioSegment.from_file(audio_file)
+
+    # Create temporary MP3 file with lower bitrate
+    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
+        temp_path = temp_file.name
+        # Export at 64kbps mono - good enough for transcription
+        audio.export(temp_path, format="mp3", bitrate=bitrate, parameters=["-ac", "1"])
+    return temp_path
+
+
+async def _transcribe_file(transport, path):
+    """Upload a file to the Whisper API through the shared transport."""
+    # Reading up to 25MB is blocking, keep it off the event loop
+    data = await asyncio.to_thread(Path(path).read_bytes)
+
+    async def call(client):
+        return await client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(os.path.basename(path), data),
+        )
+
+    transcription = await transport.request(call)
+    return transcription.text
+
+
+async def transcribe_audio_async(audio_file, transport=None):
+    """Transcribe audio using OpenAI's Whisper API (asyncio version).
 
     If the file is larger than 25MB, it will be compressed to MP3 format
     at a lower bitrate to reduce file size.
+
+    Args:
+        audio_file: Path to audio file
+        transport: OpenAITransport to use (defaults to the shared one)
     """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY environment variable not set")
 
-    client = OpenAI(api_key=api_key)
+    transport = transport or get_transport()
 
     # Check file size (25MB = 26214400 bytes)
     file_size = os.path.getsize(audio_file)
@@ -23,33 +57,28 @@ def transcribe_audio(audio_file):
     if file_size > max_size:
         # Compress to MP3 to reduce file size
         print(f"File size ({file_size / 1024 / 1024:.1f}MB) exceeds 25MB limit. Compressing...")
-        audio = AudioSegment.from_file(audio_file)
-
-        # Create temporary MP3 file with lower bitrate
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-            temp_path = temp_file.name
-            # Export at 64kbps mono - good enough for transcription
-            audio.export(temp_path, format="mp3", bitrate="64k", parameters=["-ac", "1"])
+        # Encoding is blocking, keep it off the event loop
+        temp_path = await asyncio.to_thread(_compress_for_upload, audio_file)
 
         try:
             compressed_size = os.path.getsize(temp_path)
             print(f"Compressed to {compressed_size / 1024 / 1024:.1f}MB")
-
-            with open(temp_path, "rb") as f:
-                transcription = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=f
-                )
-            return transcription.text
+            return await _transcribe_file(transport, temp_path)
         finally:
             # Clean up temporary file
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
     else:
         # File is small enough, use directly
-        with open(audio_file, "rb") as f:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=f
-            )
-        return transcription.text
+        return await _transcribe_file(transport, audio_file)
+
+
+def transcribe_audio(audio_file):
+    """Transcribe audio using OpenAI's Whisper API.
+
+    If the file is larger than 25MB, it will be compressed to MP3 format
+    at a lower bitrate to reduce file size. Runs on the shared OpenAI
+    transport, so connections are reused across calls.
+    """
+    transport = get_transport()
+    return transport.run(transcribe_audio_async(audio_file, transport))
@@ -1,143 +1,448 @@
+import math
 import os
-from audio_separator.separator import Separator
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
+import numpy as np
+import soundfile as sf
 
-def _find_existing_vocal_file(output_dir, model_filename):
-    """Check if a vocal file from the specified model already exists in output dir.
+from .cache import ModelListCache
+
+# Loaded separators, keyed by (model filename, single stem), reused across files
+_separators = {}
+# One lock per loaded separator; a separator runs one separation at a time
+_separator_locks = {}
+_separators_lock = threading.Lock()
+
+# Peak level stems are scaled down to before they are written
+NORMALIZATION_THRESHOLD = 0.9  # Good default for vocal analysis
+
+# Separator model metadata, shared by every model lookup (see configure_model_list)
+_model_list = ModelListCache("~/.cache/vocal-analyzer/models.json")
+
+
+def configure_model_list(path, ttl_hours=24):
+    """Set where the model list is cached and for how long (the [cache] config section)."""
+    global _model_list
+    _model_list = ModelListCache(path, ttl=ttl_hours * 3600)
+
+
+# Separator tuning and chunked separation (the [extraction] config section,
+# see configure_separation)
+_separation = {
+    "segment_size": 0,
+    "overlap": 0.0,
+    "batch_size": 1,
+    "chunk_duration": 0,
+    "chunk_crossfade": 2.0,
+    "write_stems": "sync",
+}
+
+# Separator settings that require building the separator again
+_SEPARATOR_SETTINGS = ("segment_size", "overlap", "batch_size")
+
+WRITE_STEMS_MODES = ("sync", "background")
+
+# Writes stem files in the background (extraction.write_stems = "background")
+_stem_writer = None
+
+
+def configure_separation(settings):
+    """Set segment size, overlap, batch size, chunking and stem writing of separations.
 
     Args:
-        output_dir (str): Directory to check
-        model_filename (str): Model filename to look for in file names
+        settings (dict): The [extraction] config section. segment_size and
+            overlap of 0 keep each model's defaults; chunk_duration of 0
+            separates files in one piece
+
+    Raises:
+        ValueError: if write_stems is not one of WRITE_STEMS_MODES
+    """
+    params = {name: settings[name] for name in _separation if name in settings}
+    if params.get("write_stems", "sync") not in WRITE_STEMS_MODES:
+        raise ValueError(
+            f"Unknown extraction.write_stems {params['write_stems']!r} "
+            f"(choose from {', '.join(WRITE_STEMS_MODES)})"
+        )
+    with _separators_lock:
+        rebuild = any(params.get(name, _separation[name]) != _separation[name] for name in _SEPARATOR_SETTINGS)
+        _separation.update(params)
+        if rebuild:
+            # Separators are built with these settings; rebuild them on next use
+            _separators.clear()
+
+
+def _separator_params():
+    """Per-architecture Separator arguments for the configured segment size,
+    overlap and batch size (all other values are audio-separator's defaults)."""
+    segment_size = int(_separation["segment_size"])
+    overlap = float(_separation["overlap"])
+    batch_size = int(_separation["batch_size"])
+    mdx = {"hop_length": 1024, "segment_size": 256, "overlap": 0.25, "batch_size": batch_size,
+           "enable_denoise": False}
+    vr = {"batch_size": batch_size, "window_size": 512, "aggression": 5, "enable_tta": False,
+          "enable_post_process": False, "post_process_threshold": 0.2, "high_end_process": False}
+    demucs = {"segment_size": "Default", "shifts": 2, "overlap": 0.25, "segments_enabled": True}
+    mdxc = {"segment_size": 256, "override_model_segment_size": False, "batch_size": batch_size,
+            "overlap": 8, "pitch_shift": 0}
+    if segment_size:
+        mdx["segment_size"] = segment_size
+        demucs["segment_size"] = str(segment_size)
+        mdxc["segment_size"] = segment_size
+        mdxc["override_model_segment_size"] = True
+    if overlap:
+        mdx["overlap"] = overlap
+        demucs["overlap"] = overlap
+        # MDXC steps by 1/n of a segment: overlap = 1 - 1/n
+        mdxc["overlap"] = min(50, max(2, round(1 / (1 - overlap))))
+    return {"mdx_params": mdx, "vr_params": vr, "demucs_params": demucs, "mdxc_params": mdxc}
+
+
+def _fetch_model_list():
+    from audio_separator.separator import Separator
+
+    return Separator(info_only=True).get_simplified_model_list()
+
+
+def get_model_list(refresh=False):
+    """Get the separator's model list, from the on-disk cache while it is fresh.
+
+    Args:
+        refresh (bool): Rebuild the list even if the cached one is fresh
 
     Returns:
-        str or None: Path to existing vocal file if found, None otherwise
+        dict: Model filename -> info (Name, Type, Stems, ...)
     """
-    if not os.path.exists(output_dir):
-        return None
+    return _model_list.get(_fetch_model_list, refresh=refresh)
 
-    # Extract a distinctive part of the model name for matching
-    # e.g., "model_bs_roformer_ep_317_sdr_12.9755.ckpt" -> "bs_roformer" or "htdemucs_6s"
-    model_id = model_filename.replace(".ckpt", "").replace(".yaml", "").replace("model_", "")
 
-    for file in os.listdir(output_dir):
-        if not file.endswith(".wav"):
-            continue
+def model_stem_names(model_info):
+    """Stem names of a model, e.g. ['vocals', 'instrumental'].
 
-        # Check if file contains both model identifier and "Vocals"
-        if model_id in file and ("Vocals" in file or "vocals" in file.lower()):
-            full_path = os.path.join(output_dir, file)
-            if os.path.exists(full_path):
-                return full_path
+    The model list formats stems like 'vocals* (11.8)'; the asterisk and
+    score are stripped.
+    """
+    return [stem.split("(")[0].strip().rstrip("*").strip() for stem in model_info["Stems"]]
 
-    return None
+
+def _separator_lock(model_filename, output_single_stem=None):
+    """Get the lock guarding the separator for a model."""
+    with _separators_lock:
+        return _separator_locks.setdefault(
+            (model_filename, output_single_stem), threading.RLock()
+        )
 
 
-def _find_existing_stems(output_dir, model_filename, required_stems):
-    """Check if all required stems from the specified model already exist.
+def get_separator(model_filename, output_dir, output_single_stem=None):
+    """Get a Separator with the model loaded, reusing one per model.
+
+    Loading a model is a large share of per-file time, so a separator is
+    created and loaded once per (model, single stem) combination and then
+    pointed at the requested output directory for each file.
 
     Args:
-        output_dir (str): Directory to check
-        model_filename (str): Model filename to look for in file names
-        required_stems (list): List of stem names to look for
+        model_filename (str): Model to load
+        output_dir (str): Directory where output files will be saved
+        output_single_stem (str): Only output this stem (None for all stems)
 
     Returns:
-        dict or None: Dictionary mapping stem names to file paths if all found, None otherwise
+        Separator: Separator ready to call separate() on
+    """
+    key = (model_filename, output_single_stem)
+    with _separator_lock(model_filename, output_single_stem):
+        separator = _separators.get(key)
+        if separator is None:
+            from audio_separator.separator import Separator
+
+            separator = Separator(
+                model_file_dir="/tmp/audio-separator-models/",  # Cache models here
+                output_dir=output_dir,
+                output_format="wav",
+                output_single_stem=output_single_stem,
+                normalization_threshold=NORMALIZATION_THRESHOLD,
+                sample_rate=44100,  # Standard sample rate
+                **_separator_params(),
+            )
+
+            # Load the specified model (downloads automatically if needed)
+            separator.load_model(model_filename=model_filename)
+            _separators[key] = separator
+
+    # Redirect the (possibly reused) separator to this file's output directory.
+    # Callers must hold _separator_lock while using it, since this is shared state.
+    os.makedirs(output_dir, exist_ok=True)
+    separator.output_dir = output_dir
+    separator.model_instance.output_dir = output_dir
+    return separator
+
+
+def _chunk_windows(frames, chunk, overlap):
+    """(start, stop) frames of windows of chunk frames, each overlapping the
+    previous one by overlap frames, covering frames in total."""
+    windows = []
+    start = 0
+    while True:
+        stop = min(start + chunk, frames)
+        windows.append((start, stop))
+        if stop >= frames:
+            return windows
+        start += chunk - overlap
+
+
+def _background_writer():
+    global _stem_writer
+    with _separators_lock:
+        if _stem_writer is None:
+            _stem_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="va-stem-writer")
+        return _stem_writer
+
+
+def _normalized(y, threshold):
+    """Scale y down to a peak of threshold, as the separator does before writing."""
+    peak = float(np.max(np.abs(y))) if y.size else 0.0
+    if peak > threshold:
+        y *= threshold / peak
+    return y
+
+
+def _frames(stem_source):
+    """float32 (frames, channels) copy of a stem handed to write_audio."""
+    samples = np.array(stem_source, dtype=np.float32)
+    if samples.ndim == 2 and samples.shape[0] < samples.shape[1]:
+        samples = samples.T
+    return samples
+
+
+def _write_stem(path, samples, sample_rate):
+    """Write a captured stem like the separator does (16-bit PCM)."""
+    sf.write(path, samples, sample_rate, subtype="PCM_16")
+    return path
+
+
+@contextmanager
+def _captured_writes(separator, output_dir, capture):
+    """Keep the samples of every stem the separator writes in the block.
+
+    Stores path -> (samples, sample_rate, write) in capture, with samples a
+    float32 (frames, channels) copy normalized like the file, and write the
+    Future of the file write when stems are written in the background (else
+    None). Background writes write that copy with soundfile: the separator's
+    own write_audio depends on per-file state that separate() resets when it
+    returns, so it can only run inside the separation.
+
+    Callers must hold the separator's lock, since write_audio is replaced on
+    the shared model instance for the duration of the block.
     """
-    if not os.path.exists(output_dir):
-        return None
+    model = separator.model_instance
+    write_audio = model.write_audio
+    background = _separation["write_stems"] == "background"
+
+    def capture_write(stem_path, stem_source):
+        samples = _normalized(_frames(stem_source), separator.normalization_threshold)
+        path = stem_path if os.path.isabs(stem_path) else os.path.join(output_dir, stem_path)
+        write = None
+        if background:
+            write = _background_writer().submit(_write_stem, path, samples, separator.sample_rate)
+        else:
+            write_audio(stem_path, stem_source)
+        capture[path] = (samples, separator.sample_rate, write)
 
-    model_id = model_filename.replace(".ckpt", "").replace(".yaml", "").replace("model_", "")
-    found_stems = {}
+    model.write_audio = capture_write
+    try:
+        yield
+    finally:
+        del model.write_audio
 
-    for file in os.listdir(output_dir):
-        if not file.endswith(".wav"):
-            continue
 
-        # Only consider files from this model
-        if model_id not in file:
-            continue
+def _produced(path, capture):
+    """Whether the separator produced path (which may still be being written)."""
+    return os.path.exists(path) or (capture is not None and path in capture)
 
-        # Try to match each required stem
-        for stem_name in required_stems:
-            if stem_name in found_stems:
-                continue
 
-            # Check various naming patterns
-            stem_patterns = [
-                f"_({stem_name.capitalize()})_",
-                f"({stem_name.capitalize()})",
-                f"_{stem_name.capitalize()}_",
-                f"_({stem_name.lower()})_",
-                f"({stem_name.lower()})",
-                f"_{stem_name.lower()}_",
-            ]
-
-            for pattern in stem_patterns:
-                if pattern in file:
-                    full_path = os.path.join(output_dir, file)
-                    if os.path.exists(full_path):
-                        found_stems[stem_name] = full_path
-                        break
+def _separate(separator, input_file, output_dir, capture=None, quiet=False):
+    """Separate a file, in overlapping chunks when it is longer than extraction.chunk_duration.
 
-    # Only return if we found all required stems
-    if len(found_stems) == len(required_stems):
-        return found_stems
+    Callers must hold the separator's lock.
 
-    return None
+    Args:
+        separator: Separator from get_separator
+        input_file (str): Path to the input audio file
+        output_dir (str): Directory the separator writes to
+        capture (dict): Filled with the samples of the stems (see
+            _captured_writes), unless the file is separated in chunks
+        quiet (bool): Don't report progress through the chunks
+
+    Returns:
+        list: Paths of the stem files in output_dir
+    """
+    chunk_duration = _separation["chunk_duration"]
+    info = None
+    if chunk_duration:
+        try:
+            info = sf.info(input_file)
+        except Exception:
+            # Formats soundfile can't read are separated in one piece
+            info = None
+    if info is None or info.duration <= chunk_duration:
+        if capture is None:
+            output_files = separator.separate(input_file)
+        else:
+            with _captured_writes(separator, output_dir, capture):
+                output_files = separator.separate(input_file)
+        return [
+            path if os.path.isabs(path) else os.path.join(output_dir, path)
+            for path in output_files
+        ]
+    return _separate_chunked(
+        separator, input_file, output_dir, info, chunk_duration, _separation["chunk_crossfade"], quiet
+    )
 
 
-def extract_vocals(input_file, output_dir, model_filename="model_bs_roformer_ep_317_sdr_12.9755.ckpt"):
+def _separate_chunked(separator, input_file, output_dir, info, chunk_duration, crossfade, quiet=False):
+    """Separate long audio window by window and crossfade the stems together.
+
+    Each window is written to a temporary WAV and separated on its own, and
+    its stems are appended to float stem files with a linear crossfade over
+    the overlap. Only one window's audio and stems are held in memory, so
+    peak memory does not grow with the length of the track.
+
+    The separator's own peak normalization is turned off for the windows,
+    since it would scale each window differently and make the level jump
+    at every boundary; each stitched stem is normalized once instead, as
+    it is written to output_dir.
+    """
+    sr_in = info.samplerate
+    chunk = int(chunk_duration * sr_in)
+    overlap = min(int(crossfade * sr_in), chunk // 2)
+    windows = _chunk_windows(info.frames, chunk, overlap)
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    writers = {}  # stem file name -> stitched float SoundFile in the work directory
+    peaks = {}  # stem file name -> peak level of the stitched stem
+    tails = {}  # stem file name -> end of the last window's stem, overlapping the next window
+    stems = {}  # stem file name -> (samples, sample rate) of the window being separated
+
+    def keep_stem(stem_path, stem_source):
+        stems[os.path.basename(stem_path)] = (_frames(stem_source), separator.sample_rate)
+
+    work_dir = tempfile.mkdtemp(prefix=".va-chunks-", dir=output_dir)
+    chunk_file = os.path.join(work_dir, "input", f"{base_name}.wav")  # stems are named after it
+    stitched_dir = os.path.join(work_dir, "stitched")
+    os.makedirs(os.path.dirname(chunk_file))
+    os.makedirs(stitched_dir)
+    model = separator.model_instance
+    threshold = getattr(model, "normalization_threshold", NORMALIZATION_THRESHOLD)
+    separator.output_dir = model.output_dir = work_dir
+    model.normalization_threshold = math.inf
+    model.write_audio = keep_stem
+    try:
+        with sf.SoundFile(input_file) as source:
+            for index, (start, stop) in enumerate(windows):
+                if not quiet:
+                    print(f"Separating chunk {index + 1}/{len(windows)}...")
+                source.seek(start)
+                samples = source.read(stop - start, dtype="float32", always_2d=True)
+                sf.write(chunk_file, samples, sr_in, subtype="FLOAT")
+                del samples
+
+                for path in separator.separate(chunk_file):
+                    name = os.path.basename(path)
+                    if name in stems:
+                        y, sr_out = stems.pop(name)
+                    else:
+                        # Written by the separator itself rather than write_audio
+                        path = path if os.path.isabs(path) else os.path.join(work_dir, path)
+                        y, sr_out = sf.read(path, dtype="float32", always_2d=True)
+                        os.remove(path)
+                    if name not in writers:
+                        writers[name] = sf.SoundFile(
+                            os.path.join(stitched_dir, name), "w", sr_out, y.shape[1], subtype="FLOAT"
+                        )
+                        peaks[name] = 0.0
+
+                    tail = tails.pop(name, None)
+                    if tail is not None:
+                        n = min(len(tail), len(y))
+                        ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)[:, None]
+                        y[:n] = tail[:n] * (1 - ramp) + y[:n] * ramp
+                    if index + 1 < len(windows):
+                        # Hold back the part the next window overlaps
+                        keep = round((windows[index + 1][0] - start) * sr_out / sr_in)
+                        tails[name] = y[keep:]
+                        y = y[:keep]
+                    writers[name].write(y)
+                    if y.size:
+                        peaks[name] = max(peaks[name], float(np.max(np.abs(y))))
+
+        for writer in writers.values():
+            writer.close()
+        for name in writers:
+            # Normalize the whole stem once, block by block
+            gain = threshold / peaks[name] if peaks[name] > threshold else 1.0
+            with sf.SoundFile(os.path.join(stitched_dir, name)) as stitched, sf.SoundFile(
+                os.path.join(output_dir, name), "w", stitched.samplerate, stitched.channels,
+                subtype="PCM_16",
+            ) as out:
+                for block in stitched.blocks(blocksize=1 << 18, dtype="float32", always_2d=True):
+                    out.write(block * gain)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        del model.write_audio
+        model.normalization_threshold = threshold
+        separator.output_dir = model.output_dir = output_dir
+    return [os.path.join(output_dir, name) for name in writers]
+
+
+def extract_vocals(
+    input_file,
+    output_dir,
+    model_filename="model_bs_roformer_ep_317_sdr_12.9755.ckpt",
+    capture=None,
+    quiet=False,
+):
     """Extract vocals from an audio file using audio-separator.
 
     Args:
         input_file (str): Path to the input audio file
         output_dir (str): Directory where output files will be saved
         model_filename (str): Model to use for separation (defaults to high-quality roformer model)
+        capture (dict): Filled with path -> (samples, sample_rate, write) of
+            the separated stem, so it can be analyzed without reading the
+            file back; write is the Future of a background file write
+            (extraction.write_stems) or None. Stays empty for chunked separations
+        quiet (bool): Don't report progress through the chunks of a long file
 
     Returns:
         str: Path to the extracted vocal file
     """
-    # Check if vocal file already exists from this model
-    existing_vocal = _find_existing_vocal_file(output_dir, model_filename)
-    if existing_vocal:
-        print(f"Found existing vocal file from {model_filename}, skipping extraction: {os.path.basename(existing_vocal)}")
-        return existing_vocal
-
-    # Initialize the separator with optimized settings for vocal extraction
-    separator = Separator(
-        model_file_dir="/tmp/audio-separator-models/",  # Cache models here
-        output_dir=output_dir,
-        output_format="wav",
-        output_single_stem="Vocals",  # Only output vocals stem
-        normalization_threshold=0.9,  # Good default for vocal analysis
-        sample_rate=44100,  # Standard sample rate
-    )
-
-    # Load the specified vocal separation model (downloads automatically if needed)
-    separator.load_model(model_filename=model_filename)
-
     try:
-        # Perform separation
-        output_files = separator.separate(input_file)
+        # Perform separation with a separator that only outputs the vocals stem
+        with _separator_lock(model_filename, "Vocals"):
+            separator = get_separator(model_filename, output_dir, output_single_stem="Vocals")
+            output_files = _separate(separator, input_file, output_dir, capture, quiet)
 
         # Find the vocals file from the output
         vocal_file = None
 
-        # audio-separator returns full paths, look for the vocals file
+        # Look for the vocals file among the returned paths
         for file_path in output_files:
             # Check if this is the vocals file (contains "Vocals" in filename)
             if (
                 "Vocals" in os.path.basename(file_path)
                 or "vocals" in os.path.basename(file_path).lower()
             ):
-                if os.path.exists(file_path):
+                if _produced(file_path, capture):
                     vocal_file = file_path
                     break
 
         # If not found by name, check all files in output directory
         if not vocal_file and output_files:
             for file_path in output_files:
-                if os.path.exists(file_path):
+                if _produced(file_path, capture):
                     vocal_file = file_path
                     break
 
@@ -152,7 +457,7 @@ def extract_vocals(input_file, output_dir, model_filename="model_bs_roformer_ep_
                         vocal_file = full_path
                         break
 
-        if vocal_file and os.path.exists(vocal_file):
+        if vocal_file and _produced(vocal_file, capture):
             return vocal_file
         else:
             # Debug information
@@ -167,13 +472,17 @@ def extract_vocals(input_file, output_dir, model_filename="model_bs_roformer_ep_
         raise Exception(f"Vocal extraction failed: {str(e)}")
 
 
-def extract_all_stems(input_file, output_dir, model_filename="htdemucs_6s.yaml"):
+def extract_all_stems(
+    input_file, output_dir, model_filename="htdemucs_6s.yaml", capture=None, quiet=False
+):
     """Extract all available stems from an audio file using audio-separator.
 
     Args:
         input_file (str): Path to the input audio file
         output_dir (str): Directory where output files will be saved
         model_filename (str): Model to use for separation (defaults to high-quality roformer model)
+        capture (dict): Filled with the samples of the stems (see extract_vocals)
+        quiet (bool): Don't report progress through the chunks of a long file
 
     Returns:
         dict: Dictionary mapping stem names to their file paths
@@ -182,72 +491,24 @@ def extract_all_stems(input_file, output_dir, model_filename="htdemucs_6s.yaml")
         stems = extract_all_stems("song.mp3", "/output")
         # Returns: {"vocals": "/output/song_Vocals.wav", "instrumental": "/output/song_Instrumental.wav"}
     """
-    # Get information about what stems this model provides (before separation)
+    # Check that the model is known before starting a long separation
     model_info = get_model_stem_info(model_filename)
     if not model_info:
         raise Exception(f"Could not find information for model {model_filename}")
 
-    # Parse stem names from the model info
-    available_stems = []
-    for stem_info in model_info["Stems"]:
-        stem_name = stem_info.split("(")[0].strip().rstrip("*").strip()
-        available_stems.append(stem_name)
-
-    # Check if all stems already exist from this model
-    existing_stems = _find_existing_stems(output_dir, model_filename, available_stems)
-    if existing_stems:
-        print(f"Found existing stems from {model_filename}, skipping extraction:")
-        for stem_name, file_path in existing_stems.items():
-            print(f"  {stem_name}: {os.path.basename(file_path)}")
-        return existing_stems
-
-    # Initialize the separator WITHOUT output_single_stem to get all stems
-    separator = Separator(
-        model_file_dir="/tmp/audio-separator-models/",  # Cache models here
-        output_dir=output_dir,
-        output_format="wav",
-        # NOTE: No output_single_stem parameter - this means all stems will be output
-        normalization_threshold=0.9,  # Good default for vocal analysis
-        sample_rate=44100,  # Standard sample rate
-    )
-
-    # Load the specified model
-    separator.load_model(model_filename=model_filename)
-
     try:
-        # Perform separation - this will output all available stems
-        output_files = separator.separate(input_file)
+        # Perform separation - a separator WITHOUT output_single_stem outputs all stems
+        with _separator_lock(model_filename):
+            separator = get_separator(model_filename, output_dir)
+            output_files = _separate(separator, input_file, output_dir, capture, quiet)
 
-        # Convert relative paths to absolute paths
-        absolute_output_files = []
-        for file_path in output_files:
-            if os.path.isabs(file_path):
-                absolute_output_files.append(file_path)
-            else:
-                # Join with output directory to get absolute path
-                absolute_path = os.path.join(output_dir, file_path)
-                absolute_output_files.append(absolute_path)
+        # _separate already resolved the returned paths against output_dir
+        absolute_output_files = output_files
 
         print(f"Found {len(absolute_output_files)} output files from separation.")
 
-        # Get information about what stems this model provides
-        models_info = separator.get_simplified_model_list()
-        model_info = None
-        for filename, info in models_info.items():
-            if model_filename in filename:
-                model_info = info
-                break
-
-        if not model_info:
-            raise Exception(f"Could not find information for model {model_filename}")
-
-        # Parse stem names from the model info
-        # The format is like: ['vocals* (11.8)', 'instrumental (16.5)']
-        available_stems = []
-        for stem_info in model_info["Stems"]:
-            # Extract just the stem name (remove asterisk and score info)
-            stem_name = stem_info.split("(")[0].strip().rstrip("*").strip()
-            available_stems.append(stem_name)
+        # Stems this model provides (looked up before the separation)
+        available_stems = model_stem_names(model_info)
 
         print(f"Model '{model_info['Name']}' can produce stems: {available_stems}")
 
@@ -255,7 +516,7 @@ def extract_all_stems(input_file, output_dir, model_filename="htdemucs_6s.yaml")
         stem_files = {}
 
         for file_path in absolute_output_files:
-            if not os.path.exists(file_path):
+            if not _produced(file_path, capture):
                 continue
 
             filename = os.path.basename(file_path)
@@ -329,10 +590,7 @@ def get_model_stem_info(model_filename="model_bs_roformer_ep_317_sdr_12.9755.ckp
     Returns:
         dict: Model information including available stems
     """
-    separator = Separator(info_only=True)
-    models_info = separator.get_simplified_model_list()
-
-    for filename, info in models_info.items():
+    for filename, info in get_model_list().items():
         if model_filename in filename:
             return info
 